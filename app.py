@@ -1,134 +1,92 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, flash
 import subprocess
 import os
 import json
 import hashlib
-from datetime import datetime, date
+import time
+from datetime import datetime
 import sys
+import biometric_client
+from ballot import get_ballot
+from chart_renderer import render_all
+from election_db import normalize_name, open_db, sqlite_enabled
+from job_manager import JobManager, JobQueueFull
+from live_feed import LiveFeed
+from tally_engine import TallyEngine
+from vote_log import CLI_VOTES_FILE, GUI_VOTES_FILE, open_log
+from vote_shards import SHARDS_DIR, ShardTally, shards_enabled, tally_shards
+from voter_roll import is_eligible, open_roll, verify_credential
+from vote_writer import VoteOutcomeUnknown, VoteWriterUnavailable, record_vote
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this'
 
+# Running vote counters and has-voted sets, updated incrementally as the
+# vote logs grow
+tally = TallyEngine()
+# Shared SQLite store when ELECTION_STORE=sqlite
+election_db = open_db() if sqlite_enabled() else None
+# District-wide view of the booth shards when ELECTION_STORE=shards
+shard_tally = ShardTally() if shards_enabled() else None
+
 # Admin credentials
 ADMIN_CREDENTIALS = {
     'admin': hashlib.sha256('admin123'.encode()).hexdigest(),
     'election_officer': hashlib.sha256('officer456'.encode()).hexdigest()
 }
 
-# Voter database (add dob field; update with your real data)
-VOTER_DATABASE = {
-    'voter1': {
-        'password': hashlib.sha256('password123'.encode()).hexdigest(),
-        'name': 'John Doe',
-        'aadhar': '123456789012',
-        'dob': '2000-01-01'
-    },
-    'voter2': {
-        'password': hashlib.sha256('password456'.encode()).hexdigest(),
-        'name': 'Jane Smith',
-        'aadhar': '123456789013',
-        'dob': '2010-05-10'  # < 18 example
-    },
-    'voter3': {
-        'password': hashlib.sha256('password789'.encode()).hexdigest(),
-        'name': 'Bob Johnson',
-        'aadhar': '123456789014',
-        'dob': '2003-11-30'
-    }
-}
+# Electoral roll (voters table); import it with `python voter_roll.py <roll.csv>`.
+# Running app.py directly also imports VOTER_ROLL_FILE into an empty table
+voter_roll = open_db()
+
+# Parties offered on the web ballot (same ballot file as the kiosks)
+PARTIES = get_ballot().parties
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def is_18_or_above(dob_str):
-    """Return True if age >= 18, else False."""
-    try:
-        dob = datetime.strptime(dob_str, "%Y-%m-%d").date()
-    except ValueError:
-        return False
-    today = date.today()
-    age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-    return age >= 18
-
 def get_voting_stats():
     """Get real-time voting statistics from your biometric system"""
-    stats = {
-        'total_votes': 0,
-        'parties': {},
-        'avg_score': 0,
-        'methods': {}
-    }
     try:
-        # Load CLI votes
-        cli_votes_file = "data/votes.json"
-        if os.path.exists(cli_votes_file):
-            with open(cli_votes_file, "r") as f:
-                content = f.read().strip()
-                if content:
-                    cli_votes = json.loads(content)
-                    for user, vote_data in cli_votes.items():
-                        if isinstance(vote_data, dict):
-                            choice = vote_data.get('choice', 'Unknown')
-                            party_map = {'1': 'BJP', '2': 'Congress', '3': 'AAP', '4': 'Others'}
-                            party = party_map.get(str(choice), 'Unknown')
-                            stats['parties'][party] = stats['parties'].get(party, 0) + 1
-                            stats['total_votes'] += 1
-                            if 'verification_score' in vote_data:
-                                stats['avg_score'] += vote_data['verification_score']
-                            stats['methods']['CLI'] = stats['methods'].get('CLI', 0) + 1
-
-        # Load GUI votes
-        gui_votes_file = "voted_users.json"
-        if os.path.exists(gui_votes_file):
-            with open(gui_votes_file, "r") as f:
-                content = f.read().strip()
-                if content:
-                    gui_votes = json.loads(content)
-                    for user, vote_data in gui_votes.items():
-                        if isinstance(vote_data, dict):
-                            party = vote_data.get('party', 'Unknown')
-                            stats['parties'][party] = stats['parties'].get(party, 0) + 1
-                            stats['total_votes'] += 1
-                            if 'verification_score' in vote_data:
-                                stats['avg_score'] += vote_data['verification_score']
-                            stats['methods']['GUI'] = stats['methods'].get('GUI', 0) + 1
-
-        # Calculate average score
-        if stats['total_votes'] > 0:
-            stats['avg_score'] = stats['avg_score'] / stats['total_votes']
+        if election_db is not None:
+            return election_db.stats()
+        if shard_tally is not None:
+            return shard_tally.stats()
+        return tally.stats()
     except Exception as e:
         print(f"Error loading stats: {e}")
-    return stats
+        return {'total_votes': 0, 'parties': {}, 'avg_score': 0, 'methods': {}}
+
+def results_version():
+    """Monotonic counter bumped whenever the vote store changes"""
+    if election_db is not None:
+        return election_db.version()
+    if shard_tally is not None:
+        return shard_tally.refresh()
+    return tally.refresh()
+
+# Versions restart with the process, so ETags carry the start time too
+RESULTS_EPOCH = f"{int(time.time()):x}"
+
+def results_etag():
+    return f"{RESULTS_EPOCH}-{results_version()}"
+
+# Pushes results to connected admin dashboards when votes arrive
+live_feed = LiveFeed(get_voting_stats, results_version)
+# Background chart rendering, so requests never wait on it
+jobs = JobManager()
+
+def voter_key(name):
+    """Identity votes are recorded under on every channel (kiosk, CLI, web): the normalized name"""
+    return normalize_name(name)
 
 def check_voter_voted(voter_id):
-    """Check if voter has already voted"""
-    # Check CLI votes
-    cli_votes_file = "data/votes.json"
-    if os.path.exists(cli_votes_file):
-        try:
-            with open(cli_votes_file, "r") as f:
-                content = f.read().strip()
-                if content:
-                    cli_votes = json.loads(content)
-                    if voter_id in cli_votes:
-                        return True
-        except:
-            pass
-
-    # Check GUI votes
-    gui_votes_file = "voted_users.json"
-    if os.path.exists(gui_votes_file):
-        try:
-            with open(gui_votes_file, "r") as f:
-                content = f.read().strip()
-                if content:
-                    gui_votes = json.loads(content)
-                    if voter_id in gui_votes:
-                        return True
-        except:
-            pass
-
-    return False
+    """Check if voter has already voted (voter_id is a voter_key)"""
+    if election_db is not None:
+        return election_db.has_voted(voter_id)
+    if shard_tally is not None:
+        return shard_tally.has_voted(voter_id)
+    return tally.has_voted(voter_id)
 
 # Routes
 @app.route('/')
@@ -148,21 +106,20 @@ def voter_authenticate():
     voter_id = request.form.get('voter_id')
     password = request.form.get('password')
 
-    if voter_id in VOTER_DATABASE:
-        stored_password = VOTER_DATABASE[voter_id]['password']
-        if hash_password(password) == stored_password:
-            # Age check
-            dob_str = VOTER_DATABASE[voter_id].get('dob')
-            if dob_str and not is_18_or_above(dob_str):
+    voter = voter_roll.get_voter(voter_id) if voter_id else None
+    if voter is not None:
+        if verify_credential(password, voter['password_hash']):
+            # Age check against the eligibility date computed at import
+            if not is_eligible(voter):
                 flash('You are not 18 and you are not eligible to vote', 'error')
                 return redirect(url_for('voter_login'))
 
-            if check_voter_voted(voter_id):
+            if check_voter_voted(voter_key(voter['name'])):
                 flash('You have already voted!', 'error')
                 return redirect(url_for('voter_login'))
 
             session['voter_id'] = voter_id
-            session['voter_name'] = VOTER_DATABASE[voter_id]['name']
+            session['voter_name'] = voter['name']
             session['user_type'] = 'voter'
             return redirect(url_for('voter_dashboard'))
 
@@ -206,40 +163,94 @@ def start_biometric_voting():
         return jsonify({'error': 'Unauthorized'}), 401
 
     try:
-        if not os.path.exists('gui_main_multimodal.py'):
-            return jsonify({'error': 'Biometric system not found. Please ensure gui_main_multimodal.py exists.'}), 500
-
-        process = subprocess.Popen([sys.executable, "gui_main_multimodal.py"])
-        return jsonify({
-            'status': 'success',
-            'message': 'Biometric voting interface started',
-            'process_id': process.pid
-        })
+        result = biometric_client.verify(session['voter_name'])
+    except biometric_client.ServiceUnavailable as e:
+        return jsonify({'error': f'Biometric service not running. Start it with "python biometric_service.py". ({e})'}), 503
     except Exception as e:
-        return jsonify({'error': f'Failed to start biometric system: {str(e)}'}), 500
+        return jsonify({'error': f'Failed to run biometric verification: {str(e)}'}), 500
+
+    if not result.get('verified'):
+        return jsonify({'error': result.get('error', 'Biometric verification failed'),
+                        'score': result.get('score', 0.0)}), 403
+
+    session['verification_score'] = result['score']
+    return jsonify({
+        'status': 'success',
+        'message': 'Biometric verification successful',
+        'score': result['score'],
+        'parties': PARTIES
+    })
+
+@app.route('/cast-vote', methods=['POST'])
+def cast_vote():
+    if 'voter_id' not in session or 'verification_score' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    party = (request.get_json(silent=True) or {}).get('party')
+    if party not in PARTIES:
+        return jsonify({'error': 'Invalid party'}), 400
+
+    # Same identity the kiosks record votes under, so one voter can not vote
+    # once on the web and again at a booth
+    voter = voter_key(session['voter_name'])
+    if check_voter_voted(voter):
+        return jsonify({'error': 'You have already voted!'}), 409
+
+    vote_record = {
+        "roll_id": session['voter_id'],
+        "code": get_ballot().code_of(party),
+        "verification_score": float(session['verification_score']),
+        "timestamp": datetime.now().isoformat(),
+        "verification_method": "multimodal"
+    }
+    # The vote writer does the atomic check-and-set shared with every kiosk
+    try:
+        status = record_vote(voter, party, "Web", vote_record)
+    except VoteWriterUnavailable:
+        return jsonify({'error': 'Vote recording service unavailable, please try again shortly'}), 503
+    except VoteOutcomeUnknown:
+        session.pop('verification_score')
+        return jsonify({'error': 'Your vote could not be confirmed. Please contact an election officer.'}), 500
+    if status == 'duplicate':
+        session.pop('verification_score')
+        return jsonify({'error': 'You have already voted!'}), 409
+    if status != 'recorded':
+        return jsonify({'error': 'Vote could not be recorded'}), 500
+    session.pop('verification_score')
+
+    return jsonify({'status': 'success', 'message': f'Your vote for {party} has been recorded'})
+
+def render_results(job):
+    """Background job: render every results chart in this process"""
+    job.update(0.05, 'Rendering charts')
+    timings = render_all(progress=job.update)
+    if timings['errors']:
+        # Fails the job rather than reporting a partial render as done
+        raise RuntimeError('Could not render ' + ', '.join(
+            f'{name} ({error})' for name, error in timings['errors'].items()))
+    return dict(timings, message='Results generated successfully')
 
 @app.route('/generate-results', methods=['POST'])
 def generate_results():
     if 'admin_user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
 
+    # Clicks while a render of the same data is queued or running join that job
     try:
-        if not os.path.exists('results_visualizer.py'):
-            return jsonify({'error': 'Results visualizer not found'}), 500
-
-        result = subprocess.run(
-            [sys.executable, "-c",
-             "from results_visualizer import VotingResultsVisualizer; v = VotingResultsVisualizer(); v.create_all_visualizations()"],
-            capture_output=True,
-            text=True
-        )
-
-        if result.returncode == 0:
-            return jsonify({'status': 'success', 'message': 'Results generated successfully'})
-        else:
-            return jsonify({'error': f'Error generating results: {result.stderr}'}), 500
-    except Exception as e:
-        return jsonify({'error': f'Failed to generate results: {str(e)}'}), 500
+        job, created = jobs.submit(('results', results_etag()), render_results, 'generate-results')
+    except JobQueueFull as e:
+        return jsonify({'error': f'Too many result jobs queued, try again shortly ({e})'}), 503
+    return jsonify(dict(job.to_dict(), deduplicated=not created,
+                        status_url=url_for('generate_results_status', job_id=job.id))), 202
+
+@app.route('/generate-results/<job_id>')
+def generate_results_status(job_id):
+    if 'admin_user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/clear-all-data', methods=['POST'])
 def clear_all_data():
@@ -250,13 +261,14 @@ def clear_all_data():
         if os.path.exists('clear_biometric_data.py'):
             subprocess.run([sys.executable, "clear_biometric_data.py"])
         else:
-            files_to_clear = ["data/votes.json", "voted_users.json"]
-            dirs_to_clear = ["data/embeddings", "registered_faces"]
+            files_to_clear = [CLI_VOTES_FILE, GUI_VOTES_FILE]
+            dirs_to_clear = ["data/embeddings", "registered_faces", SHARDS_DIR]
 
             for file_path in files_to_clear:
-                if os.path.exists(file_path):
-                    with open(file_path, 'w') as f:
-                        json.dump({}, f)
+                open_log(file_path).clear()
+            if election_db is not None:
+                election_db.clear_votes()
+            open_db().clear_registrations()
 
             for dir_path in dirs_to_clear:
                 if os.path.exists(dir_path):
@@ -272,8 +284,34 @@ def clear_all_data():
 def get_live_results():
     if 'admin_user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
-    stats = get_voting_stats()
-    return jsonify(stats)
+    # Observers polling unchanged results get a 304 without the stats being rebuilt
+    etag = results_etag()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(get_voting_stats())
+    response.set_etag(etag)
+    # Admin-only data: browsers may keep it but must revalidate; shared caches may not
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/live-results/stream')
+def live_results_stream():
+    """Server-Sent Events: one 'results' event now and one per change"""
+    if 'admin_user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(live_feed.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/district-results')
+def district_results():
+    """Map-reduce totals over the per-booth vote shards; ?booths=<glob> selects a district"""
+    if 'admin_user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    booths = request.args.get('booths', '*')
+    if '/' in booths or '..' in booths:
+        return jsonify({'error': 'Invalid booth pattern'}), 400
+    return jsonify(tally_shards(booths=booths))
 
 @app.route('/logout')
 def logout():
@@ -295,9 +333,15 @@ def check_backend_status():
     for file in required_files:
         status[file] = os.path.exists(file)
 
+    try:
+        service = biometric_client.health(timeout=2)
+    except biometric_client.ServiceUnavailable:
+        service = {'status': 'unavailable'}
+
     return jsonify({
         'backend_files': status,
-        'all_present': all(status.values())
+        'all_present': all(status.values()),
+        'biometric_service': service
     })
 
 if __name__ == '__main__':
@@ -312,6 +356,10 @@ if __name__ == '__main__':
             with open(json_file, 'w') as f:
                 json.dump({}, f)
 
+    # Load the vote logs once up front so the first login does not pay for it
+    tally.refresh()
+    open_roll()
+
     print("🔗 Backend Integration Status:")
     required_files = ['gui_main_multimodal.py', 'give_vote_multimodal.py', 'results_visualizer.py']
     for file in required_files:
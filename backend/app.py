@@ -1,9 +1,22 @@
 from flask import Flask, request, jsonify, send_file
 import subprocess
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import biometric_client
+from chart_renderer import render_all
+from results_visualizer import RENDER_PROFILES, chart_path
 
 app = Flask(__name__)
 
+# Charts are regenerated in place: clients and proxies may reuse a download
+# for this many seconds, then revalidate it (ETag / Last-Modified -> 304)
+CHART_MAX_AGE = int(os.environ.get("CHART_MAX_AGE", "60"))
+# Render profile served when a download does not ask for one (?profile=print
+# gets the full-size PNG)
+DOWNLOAD_PROFILE = os.environ.get("DOWNLOAD_PROFILE", "web")
+
 @app.post("/register")
 def register():
     data = request.json
@@ -11,15 +24,21 @@ def register():
     usn = data["usn"]
     sem = data["sem"]
     dept = data["dept"]
-    subprocess.Popen(["python", "gui_main_multimodal.py"])
-    return jsonify({"status": "started multimodal GUI"}), 200
+    try:
+        result = biometric_client.register(name, aadhar=data.get("aadhar"), dob=data.get("dob"))
+    except biometric_client.ServiceUnavailable as e:
+        return jsonify({"status": "biometric service unavailable", "error": str(e)}), 503
+    return jsonify(result), 200 if result.get("status") == "registered" else 422
 
 @app.post("/vote")
 def vote():
     data = request.json
     name = data["name"]
-    subprocess.Popen(["python", "give_vote_multimodal.py"], stdin=subprocess.PIPE)
-    return jsonify({"status": "multimodal vote started"}), 200
+    try:
+        result = biometric_client.verify(name)
+    except biometric_client.ServiceUnavailable as e:
+        return jsonify({"status": "biometric service unavailable", "error": str(e)}), 503
+    return jsonify(result), 200 if result.get("verified") else 403
 
 @app.post("/clear_votes")
 def clear_votes():
@@ -28,16 +47,26 @@ def clear_votes():
 
 @app.get("/results")
 def show_results():
-    """Generate and display voting results"""
-    subprocess.run(["python", "results_visualizer.py"])
-    return jsonify({"status": "results generated"}), 200
+    """Generate voting results (?profile= renders just that profile)"""
+    profile = request.args.get("profile")
+    if profile is not None and profile not in RENDER_PROFILES:
+        return jsonify({"error": f"Unknown profile {profile}"}), 400
+    timings = render_all(profiles=[profile] if profile else None)
+    if timings["errors"]:
+        return jsonify({"status": "failed", **timings}), 500
+    return jsonify({"status": "results generated", **timings}), 200
 
 @app.get("/results/download/<chart_name>")
 def download_chart(chart_name):
-    """Download specific chart"""
-    chart_path = f"results/{chart_name}.png"
-    if os.path.exists(chart_path):
-        return send_file(chart_path, as_attachment=True)
+    """Download specific chart in a render profile (?profile=web|print)"""
+    profile = request.args.get("profile", DOWNLOAD_PROFILE)
+    if profile not in RENDER_PROFILES:
+        return jsonify({"error": f"Unknown profile {profile}"}), 400
+    path = chart_path(chart_name, profile)
+    if os.path.exists(path):
+        # Absolute path: send_file would resolve a relative one against backend/
+        return send_file(os.path.abspath(path), as_attachment=True, conditional=True,
+                         etag=True, max_age=CHART_MAX_AGE)
     else:
         return jsonify({"error": "Chart not found"}), 404
 
@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+BALLOT_FILE = os.environ.get("BALLOT_FILE", "ballot.json")
+# Code 0 is reserved for votes that do not match any candidate
+UNKNOWN_CODE = 0
+UNKNOWN_PARTY = "Unknown"
+
+
+class Ballot:
+    """Candidates of one election and the integer codes votes are stored as.
+
+    Codes come from the ballot file and never change once votes are cast
+    (the CLI's historical menu numbers 1-4 are kept as codes), while the
+    order of candidates in the file is the order they are shown in.
+    """
+
+    def __init__(self, candidates, election=""):
+        self.election = election
+        self.candidates = list(candidates)
+        self.parties = [candidate["party"] for candidate in self.candidates]
+        self.codes = {}
+        for candidate in self.candidates:
+            code = int(candidate["code"])
+            if code <= UNKNOWN_CODE or code in self.codes.values():
+                raise ValueError(f"Invalid or repeated candidate code {code} for {candidate['party']}")
+            self.codes[candidate["party"]] = code
+        self.size = max(self.codes.values(), default=0) + 1
+        # code -> party, gaps included so any code indexes it directly
+        self.names = [UNKNOWN_PARTY] * self.size
+        for party, code in self.codes.items():
+            self.names[code] = party
+
+    @classmethod
+    def load(cls, path=BALLOT_FILE):
+        with open(path, "r") as f:
+            definition = json.load(f)
+        return cls(definition["candidates"], definition.get("election", ""))
+
+    def code_of(self, party):
+        return self.codes.get(party, UNKNOWN_CODE)
+
+    def party_of(self, code):
+        try:
+            code = int(code)
+        except (TypeError, ValueError):
+            return UNKNOWN_PARTY
+        return self.names[code] if 0 <= code < self.size else UNKNOWN_PARTY
+
+    def color_of(self, party, default="lightgray"):
+        for candidate in self.candidates:
+            if candidate["party"] == party:
+                return candidate.get("color", default)
+        return default
+
+    def record_code(self, record):
+        """Candidate code of a stored vote: "code", or a legacy CLI "choice" / GUI "party" """
+        if "code" in record or "choice" in record:
+            code = record.get("code", record.get("choice"))
+            try:
+                code = int(code)
+            except (TypeError, ValueError):
+                return UNKNOWN_CODE
+            return code if 0 <= code < self.size else UNKNOWN_CODE
+        return self.code_of(record.get("party"))
+
+    def bincount(self, codes):
+        """Votes per code from an integer array of codes"""
+        return np.bincount(np.asarray(codes, dtype=np.int64), minlength=self.size)
+
+    def as_parties(self, counts):
+        """{party: votes} for the non-zero entries of a per-code count array"""
+        return {self.names[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def tally(self, codes):
+        return self.as_parties(self.bincount(codes))
+
+
+_ballot = None
+_ballot_lock = threading.Lock()
+
+
+def get_ballot(path=BALLOT_FILE):
+    """The election's ballot, loaded once per process"""
+    global _ballot
+    with _ballot_lock:
+        if _ballot is None:
+            _ballot = Ballot.load(path)
+        return _ballot
@@ -0,0 +1,273 @@
+"""Per-stage benchmarks for the biometric pipeline.
+
+Runs every stage over deterministic synthetic frames (or recorded frames from
+a directory / video) at several resolutions and reports throughput,
+p50/p95/p99 latency and peak memory as JSON. Needs no camera; the face model
+stage is skipped when insightface is not installed.
+
+    python benchmark_pipeline.py --output results/benchmark.json
+    python benchmark_pipeline.py --frames recorded/ --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from scipy.spatial.distance import euclidean
+
+import iris_codes
+from face_index import FaceIndex
+from iris_features import crop_iris, features_from_normalized, to_gray
+from verification_core import (detect_iris, detect_iris_in_eyes, extract_iris_features,
+                               frames_from_source)
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]
+SEED = 1234
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class SyntheticFace:
+    """Stand-in for an InsightFace result carrying the five keypoints"""
+
+    def __init__(self, kps):
+        self.kps = np.asarray(kps, dtype=np.float32)
+
+
+def synthetic_keypoints(width, height):
+    """Eye / nose / mouth keypoints matching the layout drawn by synthetic_frames"""
+    cx, cy = width // 2, height // 2
+    eye_dx, eye_y = width // 14, cy - height // 10
+    return [(cx - eye_dx, eye_y), (cx + eye_dx, eye_y), (cx, cy),
+            (cx - eye_dx, cy + height // 8), (cx + eye_dx, cy + height // 8)]
+
+
+def synthetic_frames(width, height, count=8, seed=SEED):
+    """Deterministic face-like frames: textured background, skin oval, two irises"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(60, 200, size=(height, width, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(frame, (0, 0), 3)
+        cx, cy = width // 2, height // 2
+        cv2.ellipse(frame, (cx, cy), (width // 6, height // 3), 0, 0, 360, (150, 170, 200), -1)
+        radius = max(6, width // 64) + i % 3
+        for ex, ey in synthetic_keypoints(width, height)[:2]:
+            cv2.circle(frame, (ex, ey), radius * 2, (235, 235, 235), -1)
+            cv2.circle(frame, (ex, ey), radius, (60 + 10 * i, 80, 110), -1)
+            cv2.circle(frame, (ex, ey), radius // 2, (15, 15, 15), -1)
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(source, width, height, count=8):
+    """Frames from a recorded video / image directory, resized to the target resolution"""
+    frames = [cv2.resize(frame, (width, height)) for frame in frames_from_source(source, count)]
+    if not frames:
+        raise ValueError(f"No frames could be read from {source}")
+    return frames[:count]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def measure(func, inputs, iterations, budget_s=10.0, warmup=1):
+    """Time `func` over `inputs` (cycled) and record peak traced memory.
+
+    Stops early once `budget_s` seconds have been spent, so pathological
+    stages (e.g. full-frame Hough at 720p) cannot stall the suite.
+    """
+    for i in range(min(warmup, iterations)):
+        func(inputs[i % len(inputs)])
+
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(inputs[i % len(inputs)])
+        samples.append(time.perf_counter() - t0)
+        if time.perf_counter() - start > budget_s and len(samples) >= 3:
+            break
+    elapsed = time.perf_counter() - start
+    samples = np.array(samples)
+
+    # Separate pass so tracemalloc overhead does not skew the latencies
+    tracemalloc.start()
+    func(inputs[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": len(samples),
+        "throughput_per_s": len(samples) / elapsed if elapsed > 0 else None,
+        "mean_ms": float(samples.mean() * 1000),
+        "p50_ms": percentile_ms(samples, 50),
+        "p95_ms": percentile_ms(samples, 95),
+        "p99_ms": percentile_ms(samples, 99),
+        "peak_traced_kb": peak / 1024,
+    }
+
+
+def load_face_model():
+    try:
+        import insightface
+    except ImportError:
+        print("[INFO] insightface not installed; skipping face_model.get stage", file=sys.stderr)
+        return None
+    model = insightface.app.FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
+    model.prepare(ctx_id=0)
+    return model
+
+
+def frame_stages(face_model):
+    """Stages whose input is a full BGR frame"""
+    stages = {
+        "detect_iris": detect_iris,
+    }
+    if face_model is not None:
+        stages["face_model.get"] = face_model.get
+    return stages
+
+
+def benchmark_resolution(frames, face_model, iterations, budget_s):
+    results = {}
+    for name, func in frame_stages(face_model).items():
+        results[name] = measure(func, frames, iterations, budget_s)
+
+    # Eye-ROI iris detection; keypoints come from the face model when it is
+    # loaded, otherwise from the known synthetic layout
+    height, width = frames[0].shape[:2]
+    faces = face_model.get(frames[0]) if face_model is not None else []
+    face = faces[0] if faces else SyntheticFace(synthetic_keypoints(width, height))
+    results["detect_iris_in_eyes"] = measure(
+        lambda frame: detect_iris_in_eyes(frame, face), frames, iterations, budget_s)
+
+    # Feature extraction needs a circle; detect it once on the first frame
+    # (falling back to a centred one) so the stage is always measured
+    circle = detect_iris_in_eyes(frames[0], face)
+    if circle is None:
+        circle = np.array([width // 2, height // 2, max(15, width // 40)])
+    pairs = [(frame, circle) for frame in frames]
+    results["extract_iris_features"] = measure(
+        lambda pair: extract_iris_features(*pair), pairs, iterations, budget_s)
+    results["iris_codes.make_template"] = measure(
+        lambda pair: iris_codes.make_template(*pair), pairs, iterations, budget_s)
+
+    normalized = [crop_iris(to_gray(frame), circle) for frame, circle in pairs]
+    batch = np.stack([crop for crop in normalized if crop is not None])
+    results[f"iris_features_batch[{len(batch)}]"] = measure(
+        features_from_normalized, [batch], iterations, budget_s)
+    return results
+
+
+def benchmark_matching(iterations, budget_s, enrolled=(1000, 100000)):
+    """Face 1:N scoring and iris distances, independent of frame resolution"""
+    rng = np.random.default_rng(SEED)
+    results = {}
+    for count in enrolled:
+        index = FaceIndex([str(i) for i in range(count)],
+                          rng.standard_normal((count, 512)).astype(np.float32))
+        probes = list(rng.standard_normal((8, 512)).astype(np.float32))
+        results[f"face_index.search[{count}]"] = measure(index.search, probes, iterations, budget_s)
+
+    registered = rng.uniform(0, 255, 140)
+    probes = list(rng.uniform(0, 255, (8, 140)))
+    results["iris_euclidean"] = measure(lambda p: euclidean(registered, p), probes, iterations, budget_s)
+
+    for count in (1, 1000, 10000):
+        templates = rng.integers(0, 256, (count, iris_codes.TEMPLATE_BYTES), dtype=np.uint8)
+        probes = list(rng.integers(0, 256, (8, iris_codes.TEMPLATE_BYTES), dtype=np.uint8))
+        results[f"iris_hamming[{count}]"] = measure(
+            lambda p: iris_codes.hamming_distances(p, templates), probes, iterations, budget_s)
+    return results
+
+
+def run(source=None, iterations=50, resolutions=RESOLUTIONS, face_model=None, budget_s=10.0):
+    report = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "source": source or "synthetic",
+            "seed": SEED,
+        },
+        "stages": {},
+    }
+    for width, height in resolutions:
+        frames = (recorded_frames(source, width, height) if source
+                  else synthetic_frames(width, height))
+        key = f"{width}x{height}"
+        print(f"[INFO] Benchmarking frame stages at {key}...", file=sys.stderr)
+        report["stages"][key] = benchmark_resolution(frames, face_model, iterations, budget_s)
+
+    print("[INFO] Benchmarking matching stages...", file=sys.stderr)
+    report["stages"]["matching"] = benchmark_matching(iterations, budget_s)
+    if resource is not None:
+        report["metadata"]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+
+def compare(report, baseline, tolerance=0.10):
+    """Print stages whose p50 latency regressed by more than `tolerance`"""
+    regressions = 0
+    for group, stages in report["stages"].items():
+        for stage, numbers in stages.items():
+            old = baseline.get("stages", {}).get(group, {}).get(stage)
+            if not old or not old.get("p50_ms"):
+                continue
+            change = numbers["p50_ms"] / old["p50_ms"] - 1
+            marker = "❌" if change > tolerance else "✅"
+            if change > tolerance:
+                regressions += 1
+            print(f"{marker} {group:>10} {stage:<32} p50 {old['p50_ms']:8.3f} -> "
+                  f"{numbers['p50_ms']:8.3f} ms ({change:+.1%})", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the biometric pipeline stages")
+    parser.add_argument("--frames", help="video file or image directory to use instead of synthetic frames")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--budget", type=float, default=10.0,
+                        help="max seconds spent timing any one stage")
+    parser.add_argument("--resolutions", nargs="+", default=[f"{w}x{h}" for w, h in RESOLUTIONS],
+                        help="e.g. 320x240 640x480")
+    parser.add_argument("--skip-face-model", action="store_true",
+                        help="do not load insightface even if it is installed")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    args = parser.parse_args()
+
+    resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions]
+    face_model = None if args.skip_face_model else load_face_model()
+    report = run(args.frames, args.iterations, resolutions, face_model, args.budget)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Benchmark report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare(report, baseline):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
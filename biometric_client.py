@@ -0,0 +1,99 @@
+import base64
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+SERVICE_URL = os.environ.get(
+    "BIOMETRIC_SERVICE_URL",
+    f"http://{os.environ.get('BIOMETRIC_SERVICE_HOST', '127.0.0.1')}:"
+    f"{os.environ.get('BIOMETRIC_SERVICE_PORT', '5055')}"
+)
+
+# Camera-driven requests can take a while; file-driven ones return quickly
+TIMEOUT = 120
+
+
+class ServiceUnavailable(Exception):
+    """Raised when the biometric service cannot be reached"""
+
+
+def encode_image(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("ascii")
+
+
+def _request(path, payload=None, service_url=SERVICE_URL, timeout=TIMEOUT):
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(service_url + path, data=data,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # Non-2xx answers still carry a JSON body describing the failure
+        return json.loads(e.read() or b"{}")
+    except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+        raise ServiceUnavailable(f"Biometric service not reachable at {service_url}: {e}")
+
+
+def _payload(image_paths=None, **fields):
+    payload = {key: value for key, value in fields.items() if value is not None}
+    if image_paths:
+        payload["frames"] = [encode_image(path) for path in image_paths]
+    return payload
+
+
+def health(**kwargs):
+    return _request("/health", **kwargs)
+
+
+def register(name, image_paths=None, aadhar=None, dob=None, **kwargs):
+    """Register a voter; without images the service uses its camera"""
+    return _request("/register", _payload(image_paths, name=name, aadhar=aadhar, dob=dob), **kwargs)
+
+
+def verify(name, image_paths=None, **kwargs):
+    """Verify a voter; without images the service uses its camera"""
+    return _request("/verify", _payload(image_paths, name=name), **kwargs)
+
+
+def identify(image_paths=None, k=3, **kwargs):
+    """Return the top-k enrolled voters matching the face in the images"""
+    return _request("/identify", _payload(image_paths, k=k), **kwargs)
+
+
+def main(argv):
+    usage = ("Usage:\n"
+             "  python biometric_client.py health\n"
+             "  python biometric_client.py register <name> [image ...]\n"
+             "  python biometric_client.py verify <name> [image ...]\n"
+             "  python biometric_client.py identify [image ...]")
+    if not argv:
+        print(usage)
+        return 1
+
+    command, args = argv[0], argv[1:]
+    try:
+        if command == "health":
+            result = health()
+        elif command == "register" and args:
+            result = register(args[0], args[1:])
+        elif command == "verify" and args:
+            result = verify(args[0], args[1:])
+        elif command == "identify":
+            result = identify(args)
+        else:
+            print(usage)
+            return 1
+    except ServiceUnavailable as e:
+        print(f"[ERROR] {e}")
+        return 2
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
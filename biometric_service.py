@@ -0,0 +1,204 @@
+import base64
+import datetime
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+# Importing the CLI module loads the buffalo_l FaceAnalysis model, the
+# embedding store and the face index exactly once for the daemon's lifetime
+import give_vote_multimodal as engine
+from election_db import normalize_aadhar, normalize_name, open_registry, registration_row, valid_name
+import iris_codes
+from verification_core import (MAX_FRAMES, MultimodalVerifier, camera_frames,
+                               extract_iris_features, locate_iris)
+
+SERVICE_HOST = os.environ.get("BIOMETRIC_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("BIOMETRIC_SERVICE_PORT", "5055"))
+
+
+class LockedFaceModel:
+    """Serializes access to the shared InsightFace sessions across request threads"""
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+
+    def get(self, frame):
+        with self.lock:
+            return self.model.get(frame)
+
+
+face_model = LockedFaceModel(engine.face_model)
+
+
+def face_index():
+    """The shared face index, reloaded if other processes enrolled voters"""
+    engine.face_index.refresh(engine.embedding_store)
+    return engine.face_index
+
+
+def decode_frame(data):
+    """Decode a base64-encoded JPEG/PNG image into a BGR frame"""
+    buffer = np.frombuffer(base64.b64decode(data), dtype=np.uint8)
+    frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image")
+    return frame
+
+
+def request_frames(payload):
+    """Frames supplied by the caller, or the booth camera when none are sent"""
+    if payload.get("frames"):
+        return [decode_frame(frame) for frame in payload["frames"]]
+    return camera_frames(int(payload.get("max_frames", MAX_FRAMES)))
+
+
+def register(payload):
+    user_name = normalize_name(payload["name"])
+    if not valid_name(user_name):
+        return 400, {"status": "failed", "error": "Invalid name"}
+    aadhar = normalize_aadhar(payload.get("aadhar"))
+    registry = open_registry()
+    if aadhar:
+        holder = registry.aadhar_holder(aadhar)
+        if holder is not None and holder != user_name:
+            return 409, {"status": "duplicate", "aadhar_registered_to": holder}
+    face_embedding = None
+    iris_features = None
+    iris_code = None
+
+    for frame in request_frames(payload):
+        faces = face_model.get(frame)
+        if face_embedding is None and faces:
+            face_embedding = faces[0].normed_embedding
+        # The store is append-only, so an iris without a code would leave a
+        # re-registering voter's old code in force; keep trying for both
+        if iris_code is None:
+            circle = locate_iris(frame, faces)
+            if circle is not None:
+                iris_features = extract_iris_features(frame, circle)
+                iris_code = iris_codes.make_template(frame, circle) if iris_features is not None else None
+        if face_embedding is not None and iris_code is not None:
+            break
+
+    if face_embedding is None or iris_code is None:
+        return 422, {"status": "failed", "face": face_embedding is not None,
+                     "iris": iris_code is not None,
+                     "error": "Could not capture both face and iris"}
+
+    duplicates = face_index().find_duplicates(face_embedding, exclude=user_name)
+    if duplicates:
+        return 409, {"status": "duplicate", "duplicate_of": duplicates[0][0],
+                     "similarity": duplicates[0][1]}
+
+    details = None
+    if aadhar and payload.get("dob"):
+        details = {
+            "aadhar": aadhar,
+            "dob": payload["dob"],
+            "biometrics": ["face", "iris"],
+            "registration_date": datetime.datetime.now().isoformat()
+        }
+        holder = registry.claim_registrations([registration_row(user_name, details)])[0]
+        if holder is not None:
+            return 409, {"status": "duplicate", "aadhar_registered_to": holder}
+
+    engine.embedding_store.append("face", user_name, face_embedding)
+    engine.embedding_store.append("iris", user_name, iris_features)
+    engine.embedding_store.append("iris_code", user_name, iris_code)
+    face_index()
+
+    if details is not None:
+        os.makedirs("registered_faces", exist_ok=True)
+        with open(f"registered_faces/{user_name}_details.json", "w") as f:
+            json.dump(details, f, indent=2)
+
+    print(f"[INFO] Registered {user_name}")
+    return 200, {"status": "registered", "name": user_name}
+
+
+def verify(payload):
+    user_name = normalize_name(payload["name"])
+    index = face_index()
+    if user_name not in index:
+        return 404, {"status": "failed", "error": "No registered face found"}
+
+    verifier = MultimodalVerifier(face_model, index, user_name,
+                                  engine.embedding_store.get("iris", user_name), face_metric="cosine",
+                                  registered_iris_code=engine.embedding_store.get("iris_code", user_name))
+    result = verifier.verify(request_frames(payload))
+    verified = result["verified"]
+    combined_score = result["combined_score"]
+    print(f"[INFO] Verification for {user_name}: {verified} (score {combined_score:.3f})")
+    return 200, dict(result, status="verified" if verified else "failed", name=user_name,
+                     score=combined_score)
+
+
+def identify(payload):
+    k = int(payload.get("k", 3))
+    for frame in request_frames(payload):
+        faces = face_model.get(frame)
+        if faces:
+            candidates = face_index().search(faces[0].embedding, k=k)
+            return 200, {"status": "ok", "candidates": candidates}
+    return 422, {"status": "failed", "error": "No face found"}
+
+
+ROUTES = {
+    "/register": register,
+    "/verify": verify,
+    "/identify": identify,
+}
+
+
+class BiometricRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body):
+        data = json.dumps(engine.convert_numpy_types(body)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "enrolled": len(face_index())})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        handler = ROUTES.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            status, body = handler(payload)
+        except (KeyError, ValueError) as e:
+            status, body = 400, {"error": f"Bad request: {e}"}
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+        self._send_json(status, body)
+
+    def log_message(self, format, *args):
+        print(f"[INFO] {self.address_string()} {format % args}")
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT):
+    server = ThreadingHTTPServer((host, port), BiometricRequestHandler)
+    print(f"[INFO] Biometric service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Biometric service stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
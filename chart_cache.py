@@ -0,0 +1,99 @@
+"""Content-addressed cache of rendered charts.
+
+A chart's key hashes the data it is drawn from together with everything
+that affects the drawing (dpi, size, plotting code, library versions), so an
+unchanged key means an identical image and matplotlib can be skipped. Entries
+live in results/cache/; the chart's file in results/ is hard-linked to the
+current entry. Files are only ever replaced, never rewritten in place, so a link can
+not corrupt a cached entry. Least recently used entries are evicted once the
+cache outgrows its disk budget.
+"""
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+
+CHART_CACHE_DIR = os.environ.get("CHART_CACHE_DIR", os.path.join("results", "cache"))
+CHART_CACHE_BYTES = int(float(os.environ.get("CHART_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def data_hash(df):
+    """Content hash of a DataFrame (values and column names, not index)"""
+    digest = hashlib.sha256(",".join(map(str, df.columns)).encode())
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def chart_key(name, data, params):
+    """Cache key of one chart: its name, data hash and render parameters"""
+    digest = hashlib.sha256(name.encode())
+    digest.update(data.encode())
+    digest.update(repr(sorted(params.items())).encode())
+    return f"{name}-{digest.hexdigest()[:32]}"
+
+
+def entry_path(key, ext=".png"):
+    return os.path.join(CHART_CACHE_DIR, key + ext)
+
+
+def link_or_copy(source, target):
+    """Atomically make target a link to (or failing that, a copy of) source"""
+    tmp = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def restore(key, path):
+    """Put the cached chart for key at path; False if it is not cached"""
+    entry = entry_path(key, os.path.splitext(path)[1])
+    if not os.path.exists(entry):
+        return False
+    try:
+        if os.path.exists(path) and os.path.samefile(entry, path):
+            return True
+        link_or_copy(entry, path)
+        # Mark as recently used for eviction
+        os.utime(entry)
+    except OSError as e:
+        print(f"[WARNING] Could not restore cached chart {key}: {e}")
+        return False
+    return True
+
+
+def store(key, path):
+    """Add the chart just written at path to the cache under key"""
+    try:
+        os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+        link_or_copy(path, entry_path(key, os.path.splitext(path)[1]))
+        evict(keep=key)
+    except OSError as e:
+        print(f"[WARNING] Could not cache chart {key}: {e}")
+
+
+def evict(budget=CHART_CACHE_BYTES, keep=None):
+    """Delete least recently used entries until the cache fits in budget bytes"""
+    entries = []
+    for entry in os.scandir(CHART_CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                # Evicted meanwhile by another render worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path, entry.name))
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, name in sorted(entries):
+        if total <= budget:
+            break
+        if keep and name.startswith(keep + "."):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
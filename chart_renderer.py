@@ -0,0 +1,78 @@
+"""Headless results rendering, kept warm inside the web process.
+
+Importing this module forces matplotlib's non-interactive Agg backend and
+pays for the pandas / matplotlib / seaborn imports once. Renders reuse one
+VotingResultsVisualizer, and with it the chart figures, so regenerating the
+charts costs only the reload of the votes and the drawing itself. With more
+than one CPU the charts are drawn concurrently by a persistent process pool,
+each worker keeping its own warm figures.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import matplotlib
+
+# Must happen before pyplot is imported anywhere in this process
+matplotlib.use("Agg")
+
+from results_visualizer import RENDER_PROFILES, VotingResultsVisualizer
+
+# Chart drawing processes; 1 draws them in this process, one after another
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# Profiles every results render produces
+RESULT_PROFILES = [profile.strip() for profile in os.environ.get("RESULT_PROFILES", "web,print").split(",")
+                   if profile.strip()]
+
+# pyplot and the shared figures are not thread-safe
+_render_lock = threading.Lock()
+_visualizer = None
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None and RENDER_WORKERS > 1:
+        # The web process runs request and job threads, so forking it could copy
+        # a lock some other thread holds; start workers from a clean process
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def render_all(progress=None, profiles=None):
+    """Reload the votes and regenerate every chart in each profile; returns a
+    timing summary, whose 'errors' maps each chart that failed to its error"""
+    global _visualizer, _pool
+    profiles = profiles or RESULT_PROFILES
+    unknown = set(profiles) - set(RENDER_PROFILES)
+    if unknown:
+        raise ValueError(f"Unknown render profile(s): {', '.join(sorted(unknown))}")
+    with _render_lock:
+        started = time.perf_counter()
+        if _visualizer is None:
+            _visualizer = VotingResultsVisualizer(interactive=False)
+        else:
+            _visualizer.load_data()
+        try:
+            timings, errors = _visualizer.create_all_visualizations(progress, pool=get_pool(), profiles=profiles)
+        except BrokenProcessPool as e:
+            print(f"[WARNING] Chart worker pool failed ({e}), rendering in-process")
+            _pool.shutdown(wait=False)
+            _pool = None
+            timings, errors = _visualizer.create_all_visualizations(progress, profiles=profiles)
+        total = time.perf_counter() - started
+    drawn = {name: seconds for name, seconds in timings.items() if seconds is not None}
+    print(f"[INFO] Rendered results in {total:.2f}s with {RENDER_WORKERS} worker(s), "
+          f"{sum(drawn.values()):.2f}s of chart time ("
+          + ", ".join(f"{name}: {seconds:.2f}s" for name, seconds in drawn.items()) + ")")
+    return {
+        'seconds': round(total, 3),
+        'workers': RENDER_WORKERS,
+        'profiles': profiles,
+        'charts': {name: None if seconds is None else round(seconds, 3) for name, seconds in timings.items()},
+        'errors': errors,
+    }
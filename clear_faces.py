@@ -1,18 +1,22 @@
 import os
 import shutil
 import json
+from election_db import open_db
 
 def clear_all_data():
     """Clear all biometric data and votes"""
     
     directories_to_clear = [
         "data/embeddings",
-        "registered_faces"
+        "registered_faces",
+        "data/shards"
     ]
     
     files_to_clear = [
         "data/votes.json",
-        "voted_users.json"
+        "data/votes.log.jsonl",
+        "voted_users.json",
+        "voted_users.log.jsonl"
     ]
     
     # Clear directories
@@ -25,6 +29,13 @@ def clear_all_data():
             except Exception as e:
                 print(f"[ERROR] Could not clear {directory}: {e}")
     
+    # Clear the registration registry along with the details files
+    try:
+        open_db().clear_registrations()
+        print("[INFO] Cleared registration registry")
+    except Exception as e:
+        print(f"[ERROR] Could not clear registration registry: {e}")
+
     # Clear files
     for file_path in files_to_clear:
         if os.path.exists(file_path):
@@ -0,0 +1,373 @@
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from ballot import get_ballot
+from vote_log import CLI_VOTES_FILE, GUI_VOTES_FILE, load_votes
+
+DB_PATH = os.environ.get("ELECTION_DB", "data/election.db")
+# "json" keeps votes in the append-only vote logs, "sqlite" uses ElectionDB
+ELECTION_STORE = os.environ.get("ELECTION_STORE", "json")
+REGISTERED_DIR = "registered_faces"
+# FULL fsyncs the WAL on every commit, matching the vote log's default of
+# fsyncing every vote; NORMAL only syncs at checkpoints and can lose
+# acknowledged votes on power failure
+SYNCHRONOUS = os.environ.get("ELECTION_DB_SYNCHRONOUS", "FULL")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS voters (
+    voter_id      TEXT PRIMARY KEY,
+    name          TEXT NOT NULL,
+    aadhar        TEXT,
+    dob           TEXT,
+    password_hash TEXT,
+    eligible_from TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_voters_aadhar ON voters(aadhar);
+
+CREATE TABLE IF NOT EXISTS registrations (
+    name              TEXT PRIMARY KEY,
+    aadhar            TEXT,
+    dob               TEXT,
+    biometrics        TEXT,
+    registration_date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS votes (
+    id                  INTEGER PRIMARY KEY,
+    voter_id            TEXT NOT NULL UNIQUE,
+    party               TEXT NOT NULL,
+    method              TEXT NOT NULL,
+    verification_method TEXT,
+    verification_score  REAL,
+    face_verified       INTEGER,
+    iris_verified       INTEGER,
+    timestamp           TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_votes_party ON votes(party);
+CREATE INDEX IF NOT EXISTS idx_votes_timestamp ON votes(timestamp);
+"""
+
+# Registry lookups by Aadhaar; also a backstop for one registration per Aadhaar
+UNIQUE_AADHAR_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_registrations_aadhar_unique ON registrations(aadhar)"
+
+VOTE_COLUMNS = ("voter_id", "party", "method", "verification_method", "verification_score",
+                "face_verified", "iris_verified", "timestamp")
+
+
+def vote_row(voter_id, party, method, record):
+    """Unified vote row from a CLI / GUI / web vote record"""
+    return (voter_id, party, method,
+            record.get("verification_method"),
+            record.get("verification_score"),
+            int(record.get("face_verified", True)),
+            int(record.get("iris_verified", True)),
+            record.get("timestamp"))
+
+
+class ElectionDB:
+    """SQLite election store in WAL mode shared by kiosks and the web app.
+
+    WAL lets any number of readers proceed while one writer commits, and the
+    UNIQUE constraint on ``votes.voter_id`` makes recording a vote an atomic
+    check-and-set across processes. Each thread gets its own connection.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.version_lock = threading.Lock()
+        self.version_conn = None
+        self.data_version = None
+        self.version_counter = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        try:
+            conn.execute(UNIQUE_AADHAR_INDEX)
+        except sqlite3.IntegrityError:
+            print(f"[WARNING] {path} already holds one Aadhar Number under several names; "
+                  f"new registrations are still checked (python election_db.py --audit)")
+        # Databases created before the roll importer lack the eligibility column
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(voters)")}
+        if "eligible_from" not in columns:
+            conn.execute("ALTER TABLE voters ADD COLUMN eligible_from TEXT")
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self.local.conn = conn
+        return conn
+
+    def transaction(self, sql, rows):
+        """executemany in one IMMEDIATE transaction; returns rows changed"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    # Votes
+
+    def record_vote(self, voter_id, party, method, record=None):
+        """Record one vote; returns False if this voter has already voted"""
+        row = vote_row(voter_id, party, method, record or {})
+        try:
+            self.connection().execute(
+                f"INSERT INTO votes ({', '.join(VOTE_COLUMNS)}) VALUES ({', '.join('?' * len(VOTE_COLUMNS))})",
+                row)
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def record_votes(self, rows):
+        """Insert a batch of vote rows in one transaction, skipping voters who already voted"""
+        return self.transaction(
+            f"INSERT OR IGNORE INTO votes ({', '.join(VOTE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(VOTE_COLUMNS))})", rows)
+
+    def record_votes_checked(self, rows):
+        """Insert a batch in one transaction; returns one bool per row (False = already voted)"""
+        sql = (f"INSERT INTO votes ({', '.join(VOTE_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(VOTE_COLUMNS))})")
+        conn = self.connection()
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                try:
+                    conn.execute(sql, row)
+                    results.append(True)
+                except sqlite3.IntegrityError:
+                    results.append(False)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def has_voted(self, voter_id):
+        return self.connection().execute(
+            "SELECT 1 FROM votes WHERE voter_id = ?", (voter_id,)).fetchone() is not None
+
+    def votes(self):
+        """Every vote as a dict, in the unified schema"""
+        return [dict(row) for row in self.connection().execute(
+            f"SELECT {', '.join(VOTE_COLUMNS)} FROM votes ORDER BY id")]
+
+    def stats(self):
+        """Same shape as TallyEngine.stats(), computed with GROUP BY"""
+        conn = self.connection()
+        total, avg_score = conn.execute(
+            "SELECT COUNT(*), COALESCE(AVG(COALESCE(verification_score, 0)), 0) FROM votes").fetchone()
+        return {
+            'total_votes': total,
+            'parties': dict(conn.execute("SELECT party, COUNT(*) FROM votes GROUP BY party").fetchall()),
+            'avg_score': avg_score,
+            'methods': dict(conn.execute("SELECT method, COUNT(*) FROM votes GROUP BY method").fetchall()),
+        }
+
+    def version(self):
+        """Counter bumped whenever any connection or process commits.
+
+        PRAGMA data_version is only comparable on one connection, so a
+        dedicated one is kept for it.
+        """
+        with self.version_lock:
+            if self.version_conn is None:
+                self.version_conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            data_version = self.version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self.data_version:
+                self.data_version = data_version
+                self.version_counter += 1
+            return self.version_counter
+
+    def clear_votes(self):
+        self.connection().execute("DELETE FROM votes")
+
+    # Voters and registrations
+
+    def upsert_voters(self, rows):
+        """Batch upsert of (voter_id, name, aadhar, dob, password_hash, eligible_from) rows"""
+        return self.transaction(
+            "INSERT OR REPLACE INTO voters (voter_id, name, aadhar, dob, password_hash, eligible_from) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def voter_count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM voters").fetchone()[0]
+
+    def get_voter(self, voter_id):
+        row = self.connection().execute("SELECT * FROM voters WHERE voter_id = ?", (voter_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim_registrations(self, rows):
+        """Upsert (name, aadhar, dob, biometrics, registration_date) rows in one transaction.
+
+        A row whose Aadhar Number is already registered under another name is
+        refused. Returns, per row, None if it was stored or the name that
+        already holds its Aadhar Number.
+        """
+        conn = self.connection()
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                holder = row[1] and conn.execute(
+                    "SELECT name FROM registrations WHERE aadhar = ? AND name != ?",
+                    (row[1], row[0])).fetchone()
+                if holder:
+                    results.append(holder[0])
+                    continue
+                # ON CONFLICT(name) rather than OR REPLACE, which would also
+                # delete a row holding the same Aadhar Number
+                conn.execute(
+                    "INSERT INTO registrations (name, aadhar, dob, biometrics, registration_date) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET aadhar = excluded.aadhar, "
+                    "dob = excluded.dob, biometrics = excluded.biometrics, "
+                    "registration_date = excluded.registration_date", row)
+                results.append(None)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def aadhar_holder(self, aadhar):
+        """Name registered with an Aadhar Number, or None"""
+        row = self.connection().execute(
+            "SELECT name FROM registrations WHERE aadhar = ?", (normalize_aadhar(aadhar),)).fetchone()
+        return row[0] if row else None
+
+    def registration_count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM registrations").fetchone()[0]
+
+    def duplicate_aadhars(self):
+        """{aadhar: [names]} for Aadhar Numbers registered under more than one name"""
+        duplicates = {}
+        for aadhar, name in self.connection().execute(
+                "SELECT aadhar, name FROM registrations WHERE aadhar IN "
+                "(SELECT aadhar FROM registrations GROUP BY aadhar HAVING COUNT(*) > 1) ORDER BY aadhar"):
+            duplicates.setdefault(aadhar, []).append(name)
+        return duplicates
+
+    def clear_registrations(self):
+        self.connection().execute("DELETE FROM registrations")
+
+    def get_registration(self, name):
+        row = self.connection().execute("SELECT * FROM registrations WHERE name = ?",
+                                        (normalize_name(name),)).fetchone()
+        if row is None:
+            return None
+        details = dict(row)
+        details["biometrics"] = json.loads(details["biometrics"] or "[]")
+        return details
+
+
+def normalize_name(name):
+    """Registry key for a voter name: lower case, single spaces"""
+    return " ".join(str(name).lower().split())
+
+
+def valid_name(name):
+    """True if a normalized name is safe as a file name part (registered_faces/<name>_details.json)"""
+    return (bool(name) and len(name) <= 100 and not name.startswith(".")
+            and not any(ch in name for ch in "/\\:\0"))
+
+
+def normalize_aadhar(aadhar):
+    """Digits of an Aadhar Number ("1234 5678 9012" -> "123456789012"), or None"""
+    digits = "".join(ch for ch in str(aadhar or "") if ch.isdigit())
+    return digits or None
+
+
+def registration_row(name, details):
+    return (normalize_name(name), normalize_aadhar(details.get("aadhar")), details.get("dob"),
+            json.dumps(details.get("biometrics", [])), details.get("registration_date"))
+
+
+def import_registrations(db, registered_dir=REGISTERED_DIR):
+    """Bulk import of <name>_details.json files; returns (imported, [(name, holder)] conflicts)"""
+    rows = []
+    for path in glob.glob(os.path.join(registered_dir, "*_details.json")):
+        name = os.path.basename(path)[:-len("_details.json")]
+        try:
+            with open(path, "r") as f:
+                rows.append(registration_row(name, json.load(f)))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[WARNING] Skipping {path}: {e}")
+    conflicts = [(row[0], holder) for row, holder in zip(rows, db.claim_registrations(rows)) if holder]
+    for name, holder in conflicts:
+        print(f"[WARNING] Not importing {name}: Aadhar Number already registered to {holder}")
+    imported = len(rows) - len(conflicts)
+    print(f"[INFO] Imported {imported} registrations into {db.path}")
+    return imported, conflicts
+
+
+def import_json(db, cli_file=CLI_VOTES_FILE, gui_file=GUI_VOTES_FILE, registered_dir=REGISTERED_DIR):
+    """One-shot import of the JSON vote files and registration details; safe to re-run"""
+    ballot = get_ballot()
+    rows = []
+    for path, method in ((cli_file, "CLI"), (gui_file, "GUI")):
+        for voter, record in load_votes(path).items():
+            if isinstance(record, dict):
+                rows.append(vote_row(voter, ballot.party_of(ballot.record_code(record)), method, record))
+    votes = db.record_votes(rows)
+    print(f"[INFO] Imported {votes} new votes into {db.path}")
+    registrations, _ = import_registrations(db, registered_dir)
+    return votes, registrations
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def open_db(path=DB_PATH):
+    """Process-wide ElectionDB"""
+    global _db
+    with _db_lock:
+        if _db is None or _db.path != path:
+            _db = ElectionDB(path)
+        return _db
+
+
+def open_registry(registered_dir=REGISTERED_DIR):
+    """The registration registry (the registrations table of the election
+    database, whatever ELECTION_STORE is), importing existing details files
+    on first use"""
+    db = open_db()
+    if not db.registration_count() and glob.glob(os.path.join(registered_dir, "*_details.json")):
+        import_registrations(db, registered_dir)
+    return db
+
+
+def sqlite_enabled():
+    return ELECTION_STORE == "sqlite"
+
+
+if __name__ == "__main__":
+    # python election_db.py --import -> copy the JSON votes and details files into SQLite
+    # python election_db.py --audit  -> registrations sharing an Aadhar Number
+    db = open_db()
+    if "--import" in sys.argv[1:]:
+        import_json(db)
+    if "--audit" in sys.argv[1:]:
+        duplicates = db.duplicate_aadhars()
+        print(f"[INFO] {db.registration_count()} registrations, "
+              f"{len(duplicates)} Aadhar Numbers registered more than once")
+        for aadhar, names in duplicates.items():
+            print(f"  {aadhar}: {', '.join(names)}")
+    else:
+        print(json.dumps(db.stats(), indent=2))
@@ -0,0 +1,251 @@
+import glob
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows kiosks fall back to the in-process lock only
+    fcntl = None
+
+EMBEDDINGS_DIR = "data/embeddings"
+META_FILE = "store.json"
+
+# Storage dtype per modality; anything not listed is stored as float32
+MODALITY_DTYPES = {
+    "face": "float32",
+    "iris": "float32",
+    # Bit-packed iris code + mask (see iris_codes.py)
+    "iris_code": "uint8",
+}
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped embedding store.
+
+    Each modality lives in two files under the store directory:
+
+    * ``<modality>.bin``   - fixed-width rows of raw ``dtype`` values
+    * ``<modality>.names`` - one voter name per line, line N names row N
+
+    Rows are never rewritten. Re-registering a voter appends a new row and
+    the name index points at the latest one. ``store.json`` records the
+    dtype and dimension of every modality, so the row matrix can be opened
+    zero-copy with ``np.memmap``.
+    """
+
+    def __init__(self, root=EMBEDDINGS_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.meta = {}
+        self.rows = {}
+        self.names = {}
+        self.arrays = {}
+        self.sizes = {}
+        self.names_bytes = {}
+        os.makedirs(self.root, exist_ok=True)
+        self._load_meta()
+
+    def _path(self, modality, suffix):
+        return os.path.join(self.root, f"{modality}.{suffix}")
+
+    def _load_meta(self):
+        meta_path = os.path.join(self.root, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self.meta = json.load(f)
+
+    def _save_meta(self):
+        meta_path = os.path.join(self.root, META_FILE)
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, meta_path)
+
+    def _row_bytes(self, modality):
+        info = self.meta[modality]
+        return np.dtype(info["dtype"]).itemsize * info["dim"]
+
+    def _read_names(self, modality):
+        """Return the complete name lines of a modality's index file"""
+        names_path = self._path(modality, "names")
+        if not os.path.exists(names_path):
+            return []
+        with open(names_path, "rb") as f:
+            data = f.read()
+        return data[:data.rfind(b"\n") + 1].decode("utf-8").splitlines()
+
+    def _refresh(self, modality):
+        """(Re)load a modality's name index if another writer has appended rows"""
+        if modality not in self.meta:
+            self._load_meta()
+        if modality not in self.meta:
+            return
+        sizes = tuple(os.path.getsize(path) if os.path.exists(path) else 0
+                      for path in (self._path(modality, "bin"), self._path(modality, "names")))
+        if self.sizes.get(modality) == sizes:
+            return
+
+        names = self._read_names(modality)
+        names = names[:min(len(names), sizes[0] // self._row_bytes(modality))]
+        self.names[modality] = names
+        self.rows[modality] = {name: row for row, name in enumerate(names)}
+        self.names_bytes[modality] = sum(len(name.encode("utf-8")) + 1 for name in names)
+        self.sizes[modality] = sizes
+        self.arrays.pop(modality, None)
+
+    def _array(self, modality):
+        """Memory-map the committed rows of a modality"""
+        if modality not in self.arrays:
+            info = self.meta[modality]
+            count = len(self.names[modality])
+            if count:
+                self.arrays[modality] = np.memmap(self._path(modality, "bin"),
+                                                  dtype=info["dtype"], mode="r",
+                                                  shape=(count, info["dim"]))
+            else:
+                self.arrays[modality] = np.zeros((0, info["dim"]), dtype=info["dtype"])
+        return self.arrays[modality]
+
+    def modalities(self):
+        return list(self.meta.keys())
+
+    def count(self, modality):
+        """Number of distinct voters enrolled for a modality"""
+        with self.lock:
+            self._refresh(modality)
+            return len(self.rows.get(modality, {}))
+
+    def row_count(self, modality):
+        """Rows appended so far, including re-registrations; grows on every append"""
+        with self.lock:
+            self._refresh(modality)
+            return len(self.names.get(modality, []))
+
+    def has(self, modality, name):
+        with self.lock:
+            self._refresh(modality)
+            return name in self.rows.get(modality, {})
+
+    def get(self, modality, name):
+        """Return a voter's latest template for a modality, or None"""
+        with self.lock:
+            self._refresh(modality)
+            row = self.rows.get(modality, {}).get(name)
+            if row is None:
+                return None
+            return self._array(modality)[row]
+
+    def matrix(self, modality):
+        """Return (names, rows) holding the latest template of every voter.
+
+        When no voter has been re-registered this is the memory map itself,
+        so nothing is copied.
+        """
+        with self.lock:
+            self._refresh(modality)
+            if modality not in self.names:
+                return [], None
+            names = self.names[modality]
+            rows = self.rows[modality]
+            array = self._array(modality)
+            if len(rows) == len(names):
+                return list(names), array
+            live = sorted(rows.values())
+            return [names[row] for row in live], np.asarray(array[live])
+
+    def append(self, modality, name, vector):
+        """Append a template for a voter; the latest row wins on lookup"""
+        if "\n" in name:
+            raise ValueError("voter names cannot contain newlines")
+        with self.lock:
+            if modality not in self.meta:
+                self._load_meta()
+            vector = np.asarray(vector).ravel()
+            if modality not in self.meta:
+                self.meta[modality] = {
+                    "dtype": MODALITY_DTYPES.get(modality, "float32"),
+                    "dim": int(vector.shape[0]),
+                }
+                self._save_meta()
+            info = self.meta[modality]
+            if vector.shape[0] != info["dim"]:
+                raise ValueError(f"{modality} templates must have {info['dim']} values, "
+                                 f"got {vector.shape[0]}")
+            data = vector.astype(info["dtype"]).tobytes()
+
+            bin_path = self._path(modality, "bin")
+            names_path = self._path(modality, "names")
+            with open(bin_path, "ab") as bin_file, open(names_path, "ab") as names_file:
+                if fcntl is not None:
+                    fcntl.flock(bin_file, fcntl.LOCK_EX)
+                try:
+                    # Pick up rows from other writers and drop any torn tail
+                    # left by a crashed one before appending
+                    self._refresh(modality)
+                    count = len(self.names.get(modality, []))
+                    row_bytes = self._row_bytes(modality)
+                    bin_file.truncate(count * row_bytes)
+                    names_file.truncate(self.names_bytes.get(modality, 0))
+                    bin_file.write(data)
+                    bin_file.flush()
+                    os.fsync(bin_file.fileno())
+                    line = name.encode("utf-8") + b"\n"
+                    names_file.write(line)
+                    names_file.flush()
+                    os.fsync(names_file.fileno())
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(bin_file, fcntl.LOCK_UN)
+
+            names = self.names.setdefault(modality, [])
+            self.rows.setdefault(modality, {})[name] = len(names)
+            names.append(name)
+            self.names_bytes[modality] = self.names_bytes.get(modality, 0) + len(line)
+            self.sizes[modality] = ((count + 1) * row_bytes, self.names_bytes[modality])
+            self.arrays.pop(modality, None)
+
+    def migrate_legacy(self, remove=False):
+        """Import per-voter <modality>_<name>.npy files into the store"""
+        migrated = 0
+        for path in sorted(legacy_files(self.root)):
+            modality, name = os.path.basename(path)[:-len(".npy")].split("_", 1)
+            if not self.has(modality, name):
+                try:
+                    vector = np.load(path).astype(np.float32).ravel()
+                    if modality == "face":
+                        vector /= max(np.linalg.norm(vector), 1e-12)
+                    self.append(modality, name, vector)
+                    migrated += 1
+                except Exception as e:
+                    print(f"[WARNING] Could not migrate {path}: {e}")
+                    continue
+            if remove:
+                os.remove(path)
+        if migrated:
+            print(f"[INFO] Migrated {migrated} legacy embedding files into {self.root}")
+        return migrated
+
+
+def legacy_files(root=EMBEDDINGS_DIR):
+    """Per-voter face_<name>.npy / iris_<name>.npy files from older releases"""
+    return [path for modality in ("face", "iris")
+            for path in glob.glob(os.path.join(root, f"{modality}_*.npy"))]
+
+
+def open_store(root=EMBEDDINGS_DIR):
+    """Open the embedding store, migrating legacy .npy files on first use"""
+    store = EmbeddingStore(root)
+    if not store.modalities() and legacy_files(root):
+        store.migrate_legacy()
+    return store
+
+
+if __name__ == "__main__":
+    store = EmbeddingStore()
+    store.migrate_legacy(remove="--remove" in sys.argv)
+    for modality in store.modalities():
+        print(f"{modality}: {store.count(modality)} voters")
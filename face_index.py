@@ -0,0 +1,152 @@
+import glob
+import os
+import threading
+
+import numpy as np
+
+EMBEDDINGS_DIR = "data/embeddings"
+
+# Cosine similarity above which two enrolments are treated as the same person
+DUPLICATE_THRESHOLD = 0.5
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row of a 2-D array (zero rows are left as zeros)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class FaceIndex:
+    """1:N face identification over every enrolled face embedding.
+
+    All embeddings are packed row-wise into one contiguous, L2-normalized
+    float32 matrix so a live embedding is scored against every voter with a
+    single matrix-vector product. Scores are cosine similarities in [-1, 1].
+    """
+
+    def __init__(self, names=None, matrix=None, dim=512):
+        self.dim = dim
+        self.names = []
+        self.rows = {}
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.lock = threading.Lock()
+        # Store rows reflected in the index, see refresh()
+        self.store_rows = None
+        if names is not None and matrix is not None:
+            self.set_embeddings(names, matrix)
+
+    @classmethod
+    def from_directory(cls, embeddings_dir=EMBEDDINGS_DIR):
+        """Build the index from the per-voter face_<name>.npy files"""
+        names = []
+        vectors = []
+        for path in sorted(glob.glob(os.path.join(embeddings_dir, "face_*.npy"))):
+            name = os.path.basename(path)[len("face_"):-len(".npy")]
+            try:
+                vectors.append(np.load(path).astype(np.float32).ravel())
+                names.append(name)
+            except Exception as e:
+                print(f"[WARNING] Skipping unreadable embedding {path}: {e}")
+
+        if not vectors:
+            return cls()
+        index = cls(dim=vectors[0].shape[0])
+        index.set_embeddings(names, np.stack(vectors))
+        print(f"[INFO] Face index loaded with {len(index)} enrolled voters")
+        return index
+
+    @classmethod
+    def from_store(cls, store):
+        """Build the index straight from an EmbeddingStore's face rows.
+
+        Face rows are stored already normalized, so the memory map is used
+        as the search matrix without copying it.
+        """
+        index = cls()
+        index.refresh(store)
+        if len(index):
+            print(f"[INFO] Face index loaded with {len(index)} enrolled voters")
+        return index
+
+    def refresh(self, store):
+        """Reload from the store if any process has appended face rows since
+        the last load; returns True if the index changed.
+
+        Long-running processes call this before searching, so voters enrolled
+        (or re-enrolled) by other kiosks are seen with their latest template.
+        """
+        rows = store.row_count("face")
+        if rows == self.store_rows:
+            return False
+        names, matrix = store.matrix("face")
+        with self.lock:
+            if matrix is None or len(names) == 0:
+                self.names, self.rows = [], {}
+                self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+            else:
+                self.names = list(names)
+                self.rows = {name: row for row, name in enumerate(self.names)}
+                self.matrix = matrix
+                self.dim = matrix.shape[1]
+            self.store_rows = rows
+        return True
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def set_embeddings(self, names, matrix):
+        """Replace the index contents with the given names and embeddings"""
+        matrix = normalize_rows(np.atleast_2d(matrix))
+        if len(names) != matrix.shape[0]:
+            raise ValueError("names and embeddings must have the same length")
+        with self.lock:
+            self.names = list(names)
+            self.rows = {name: row for row, name in enumerate(self.names)}
+            self.matrix = np.ascontiguousarray(matrix)
+            self.dim = matrix.shape[1]
+
+    def add(self, name, embedding):
+        """Add or replace a single voter's embedding"""
+        vector = normalize_rows(np.asarray(embedding).reshape(1, -1))
+        with self.lock:
+            if name in self.rows:
+                if not self.matrix.flags.writeable:
+                    self.matrix = np.array(self.matrix)
+                self.matrix[self.rows[name]] = vector[0]
+                return
+            self.rows[name] = len(self.names)
+            self.names.append(name)
+            self.matrix = np.ascontiguousarray(np.vstack([self.matrix, vector]))
+            self.dim = vector.shape[1]
+
+    def get(self, name):
+        """Return the normalized embedding for a voter, or None"""
+        row = self.rows.get(name)
+        if row is None:
+            return None
+        return self.matrix[row]
+
+    def scores(self, embedding):
+        """Cosine similarity of an embedding against every enrolled voter"""
+        probe = normalize_rows(np.asarray(embedding).reshape(1, -1))[0]
+        return self.matrix @ probe
+
+    def search(self, embedding, k=5):
+        """Return the top-k (name, similarity) candidates, best first"""
+        if len(self.names) == 0:
+            return []
+        scores = self.scores(embedding)
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[i], float(scores[i])) for i in top]
+
+    def find_duplicates(self, embedding, threshold=DUPLICATE_THRESHOLD, exclude=None, k=5):
+        """Return enrolled voters whose face matches the embedding above threshold"""
+        return [(name, score) for name, score in self.search(embedding, k=k)
+                if score >= threshold and name != exclude]
@@ -3,21 +3,28 @@ import numpy as np
 import os
 import json
 import insightface
-from scipy.spatial.distance import cosine, euclidean
 import datetime
+from face_index import FaceIndex
+from embedding_store import open_store
+from verification_core import MultimodalVerifier, camera_frames, window_callback
+from election_db import normalize_name, open_db, sqlite_enabled
+from ballot import get_ballot
+from vote_log import CLI_VOTES_FILE, open_log
 
 # Load models
 face_model = insightface.app.FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
 face_model.prepare(ctx_id=0)
 
-# Load vote status
-VOTE_FILE = "data/votes.json"
-os.makedirs("data", exist_ok=True)
-if os.path.exists(VOTE_FILE):
-    with open(VOTE_FILE, "r") as f:
-        votes = json.load(f)
-else:
-    votes = {}
+# Enrolled templates and the 1:N index over every face embedding
+embedding_store = open_store()
+face_index = FaceIndex.from_store(embedding_store)
+
+# Load vote status: snapshot + replayed vote log
+VOTE_FILE = CLI_VOTES_FILE
+vote_log = open_log(VOTE_FILE)
+votes = vote_log.load()
+# Shared SQLite store when ELECTION_STORE=sqlite
+election_db = open_db() if sqlite_enabled() else None
 
 def convert_numpy_types(obj):
     """Convert numpy types to Python native types for JSON serialization"""
@@ -33,182 +40,76 @@ def convert_numpy_types(obj):
         return [convert_numpy_types(item) for item in obj]
     return obj
 
-def detect_iris(image):
-    """Enhanced iris detection with better preprocessing"""
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    gray = cv2.medianBlur(gray, 5)
-    
-    # Apply histogram equalization for better contrast
-    gray = cv2.equalizeHist(gray)
-    
-    # Detect circles using HoughCircles
-    circles = cv2.HoughCircles(
-        gray, cv2.HOUGH_GRADIENT, dp=1, minDist=30,
-        param1=50, param2=30, minRadius=15, maxRadius=100
-    )
-    
-    if circles is not None:
-        circles = np.round(circles[0, :]).astype("int")
-        if len(circles) > 0:
-            # Return the most prominent circle (largest radius)
-            best_circle = max(circles, key=lambda c: c[2])
-            return best_circle
-    return None
-
-def extract_iris_features(image, circle):
-    """Extract iris features using texture analysis"""
-    if circle is None:
-        return None
-    
-    x, y, r = circle
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Create mask for iris region
-    mask = np.zeros(gray.shape[:2], dtype="uint8")
-    cv2.circle(mask, (x, y), r, 255, -1)
-    
-    # Extract iris region
-    iris_region = cv2.bitwise_and(gray, gray, mask=mask)
-    
-    # Crop to iris region
-    iris_cropped = iris_region[max(0, y-r):min(gray.shape[0], y+r), 
-                              max(0, x-r):min(gray.shape[1], x+r)]
-    
-    if iris_cropped.size == 0:
-        return None
-    
-    # Normalize iris region to fixed size
-    iris_normalized = cv2.resize(iris_cropped, (128, 128))
-    
-    # Extract texture features using Local Binary Pattern approach
-    features = []
-    
-    # Extract statistical features from concentric rings
-    center = (64, 64)
-    for radius in [20, 35, 50]:
-        ring_mask = np.zeros((128, 128), dtype=np.uint8)
-        cv2.circle(ring_mask, center, radius, 255, 3)
-        ring_pixels = iris_normalized[ring_mask > 0]
-        
-        if len(ring_pixels) > 0:
-            features.extend([
-                np.mean(ring_pixels),
-                np.std(ring_pixels),
-                np.median(ring_pixels),
-                np.var(ring_pixels)
-            ])
-    
-    # Extract block-wise features
-    block_size = 16
-    for i in range(0, 128, block_size):
-        for j in range(0, 128, block_size):
-            block = iris_normalized[i:i+block_size, j:j+block_size]
-            if block.size > 0:
-                features.extend([
-                    np.mean(block),
-                    np.std(block)
-                ])
-    
-    return np.array(features)
-
-def verify_face_live(user_name):
+def verify_face_live(user_name, frames=None, display=True):
     """Face verification using InsightFace"""
-    user_file = f"data/embeddings/face_{user_name.lower()}.npy"
-    if not os.path.exists(user_file):
+    user_name = user_name.lower()
+    if user_name not in face_index:
         print("[ERROR] No registered face found.")
         return False, 0.0
 
-    saved_embedding = np.load(user_file)
-    cap = cv2.VideoCapture(0)
     print("[INFO] Look at the camera for face verification...")
+    verifier = MultimodalVerifier(face_model, face_index, user_name, use_iris=False,
+                                  face_metric="cosine", max_frames=150)
+    result = verifier.verify(camera_frames(150) if frames is None else frames,
+                             on_frame=window_callback("Verifying Face - Press 'q' to exit") if display else None)
+    if display:
+        cv2.destroyAllWindows()
+
+    if result["face_verified"]:
+        print(f"[INFO] Face Verified. Confidence: {result['face_confidence']:.3f}")
+    return result["face_verified"], result["face_confidence"]
+
+def identify_face_live(k=3):
+    """Identify the voter in front of the camera against every enrolment"""
+    if len(face_index) == 0:
+        print("[ERROR] No registered faces found.")
+        return []
 
-    verified = False
+    cap = cv2.VideoCapture(0)
+    print("[INFO] Look at the camera for identification...")
+
+    candidates = []
     attempts = 0
-    confidence = 0.0
 
-    while attempts < 150:
+    while attempts < 150 and not candidates:
         ret, frame = cap.read()
         if not ret:
             continue
 
         faces = face_model.get(frame)
-        for face in faces:
-            box = face.bbox.astype(int)
-            cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (0, 255, 0), 2)
-            current_embedding = face.embedding
-            distance = cosine(saved_embedding, current_embedding)
-            confidence = float(1 - distance)
-            
-            cv2.putText(frame, f"Face Conf: {confidence:.2f}", 
-                       (box[0], box[1]-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            print(f"[DEBUG] Face Distance: {distance:.3f}, Confidence: {confidence:.3f}")
-            
-            if distance < 0.6:  # Adjusted threshold
-                print(f"[INFO] Face Verified. Confidence: {confidence:.3f}")
-                verified = True
-                break
+        if faces:
+            candidates = face_index.search(faces[0].embedding, k=k)
+            for name, score in candidates:
+                print(f"[DEBUG] Candidate: {name}, Similarity: {score:.3f}")
 
-        cv2.imshow("Verifying Face - Press 'q' to exit", frame)
-        if verified or cv2.waitKey(1) == ord('q'):
+        cv2.imshow("Identifying Voter - Press 'q' to exit", frame)
+        if cv2.waitKey(1) == ord('q'):
             break
         attempts += 1
 
     cap.release()
     cv2.destroyAllWindows()
-    return verified, confidence
+    return candidates
 
-def verify_iris_live(user_name):
+def verify_iris_live(user_name, frames=None, display=True):
     """Iris verification"""
-    user_file = f"data/embeddings/iris_{user_name.lower()}.npy"
-    if not os.path.exists(user_file):
+    saved_features = embedding_store.get("iris", user_name.lower())
+    saved_code = embedding_store.get("iris_code", user_name.lower())
+    if saved_features is None and saved_code is None:
         print("[ERROR] No registered iris found.")
         return False, 0.0
 
-    saved_features = np.load(user_file)
-    cap = cv2.VideoCapture(0)
     print("[INFO] Look directly at the camera for iris verification...")
+    verifier = MultimodalVerifier(face_model, registered_iris=saved_features, use_face=False,
+                                  max_frames=150, registered_iris_code=saved_code)
+    result = verifier.verify(camera_frames(150) if frames is None else frames,
+                             on_frame=window_callback("Verifying Iris - Press 'q' to exit") if display else None)
+    if display:
+        cv2.destroyAllWindows()
 
-    verified = False
-    attempts = 0
-    confidence = 0.0
-
-    while attempts < 150:
-        ret, frame = cap.read()
-        if not ret:
-            continue
-
-        circle = detect_iris(frame)
-        if circle is not None:
-            x, y, r = circle
-            cv2.circle(frame, (x, y), r, (255, 0, 0), 2)
-            cv2.circle(frame, (x, y), 2, (255, 0, 0), 3)
-            
-            current_features = extract_iris_features(frame, circle)
-            if current_features is not None and len(current_features) == len(saved_features):
-                distance = euclidean(saved_features, current_features)
-                # Normalize distance to confidence
-                max_distance = 2000  # Adjusted based on feature range
-                confidence = float(max(0, 1 - (distance / max_distance)))
-                
-                cv2.putText(frame, f"Iris Conf: {confidence:.2f}", 
-                           (x-50, y-r-20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-                
-                print(f"[DEBUG] Iris Distance: {distance:.1f}, Confidence: {confidence:.3f}")
-                
-                if distance < 1000:  # Adjusted threshold
-                    print(f"[INFO] Iris Verified. Confidence: {confidence:.3f}")
-                    verified = True
-                    break
-
-        cv2.imshow("Verifying Iris - Press 'q' to exit", frame)
-        if verified or cv2.waitKey(1) == ord('q'):
-            break
-        attempts += 1
-
-    cap.release()
-    cv2.destroyAllWindows()
-    return verified, confidence
+    if result["iris_verified"]:
+        print(f"[INFO] Iris Verified. Confidence: {result['iris_confidence']:.3f}")
+    return result["iris_verified"], result["iris_confidence"]
 
 def multimodal_verification(user_name):
     """Combine face and iris verification with score-level fusion"""
@@ -236,7 +137,7 @@ def multimodal_verification(user_name):
     return verified, combined_score
 
 def vote(user_name):
-    if user_name in votes:
+    if user_name in votes or (election_db is not None and election_db.has_voted(user_name)):
         print("[ERROR] You have already voted.")
         return
 
@@ -245,12 +146,19 @@ def vote(user_name):
     if verified:
         print(f"[SUCCESS] Multimodal verification passed (Score: {score:.3f})")
         print("You can now cast your vote.")
-        print("1. BJP\n2. Congress\n3. AAP\n4. Others")
-        choice = input("Enter your vote number: ")
+        ballot = get_ballot()
+        for number, party in enumerate(ballot.parties, 1):
+            print(f"{number}. {party}")
+        while True:
+            choice = input("Enter your vote number: ").strip()
+            if choice.isdigit() and 1 <= int(choice) <= len(ballot.parties):
+                break
+            print(f"[ERROR] Please enter a number between 1 and {len(ballot.parties)}")
+        party = ballot.parties[int(choice) - 1]
 
         # Create vote record with proper type conversion
         vote_record = {
-            "choice": choice,
+            "code": ballot.code_of(party),
             "verification_score": float(score),
             "face_verified": True,
             "iris_verified": True,
@@ -258,15 +166,26 @@ def vote(user_name):
         }
         
         # Convert any numpy types before saving
-        votes[user_name] = convert_numpy_types(vote_record)
-        
-        with open(VOTE_FILE, "w") as f:
-            json.dump(votes, f, indent=2)
+        vote_record = convert_numpy_types(vote_record)
+        if election_db is not None:
+            if not election_db.record_vote(user_name, party, "CLI", vote_record):
+                print("[ERROR] You have already voted.")
+                return
+        else:
+            vote_log.append(user_name, vote_record)
+        votes[user_name] = vote_record
 
         print("[SUCCESS] Your vote has been recorded securely.")
     else:
         print(f"[ERROR] Multimodal verification failed (Score: {score:.3f}). Cannot vote.")
 
 if __name__ == "__main__":
-    user_name = input("Enter your name for voting: ").lower()
+    user_name = normalize_name(input("Enter your name for voting (leave blank to identify by face): "))
+    if not user_name:
+        candidates = identify_face_live()
+        if not candidates or candidates[0][1] < 0.4:
+            print("[ERROR] Could not identify a registered voter.")
+            raise SystemExit(1)
+        user_name = candidates[0][0]
+        print(f"[INFO] Identified as {user_name} (similarity {candidates[0][1]:.3f})")
     vote(user_name)
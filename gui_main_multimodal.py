@@ -7,24 +7,34 @@ import os
 import json
 import threading
 import pyttsx3
-from scipy.spatial.distance import euclidean
 import datetime
 from datetime import date
+from face_index import FaceIndex
+from embedding_store import open_store
+from iris_codes import make_template
+from ballot import get_ballot
+from election_db import (normalize_aadhar, normalize_name, open_db, open_registry, registration_row,
+                         sqlite_enabled, valid_name)
+from tally_engine import TallyEngine
+from vote_writer import VoteOutcomeUnknown, VoteWriterUnavailable, record_vote
+from verification_core import (MultimodalVerifier, camera_frames, extract_iris_features,
+                               locate_iris, window_callback)
 
 # Load the face model
 face_model = insightface.app.FaceAnalysis(providers=['CPUExecutionProvider'])
 face_model.prepare(ctx_id=0, det_size=(640, 640))
 
-# Load voting status
-voted_users_file = "voted_users.json"
-if os.path.exists(voted_users_file):
-    try:
-        with open(voted_users_file, "r") as f:
-            voted_users = json.load(f)
-    except json.decoder.JSONDecodeError:
-        voted_users = {}
-else:
-    voted_users = {}
+# Enrolled templates and the 1:N index over every face embedding
+embedding_store = open_store()
+face_index = FaceIndex.from_store(embedding_store)
+
+# Has-voted sets kept current with votes recorded by every kiosk; the vote
+# writer makes the final check-and-set when the vote is cast
+vote_tally = TallyEngine()
+# Shared SQLite store when ELECTION_STORE=sqlite
+election_db = open_db() if sqlite_enabled() else None
+# Registrations indexed by name and Aadhar Number (one registration per Aadhar)
+registry = open_registry()
 
 # Voice engine
 try:
@@ -68,72 +78,6 @@ def is_18_or_above(dob_str):
     age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
     return age >= 18
 
-def detect_iris(image):
-    """Detect iris in the image"""
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    gray = cv2.medianBlur(gray, 5)
-    gray = cv2.equalizeHist(gray)
-
-    circles = cv2.HoughCircles(
-        gray, cv2.HOUGH_GRADIENT, dp=1, minDist=30,
-        param1=50, param2=30, minRadius=15, maxRadius=100
-    )
-
-    if circles is not None:
-        circles = np.round(circles[0, :]).astype("int")
-        if len(circles) > 0:
-            return max(circles, key=lambda c: c[2])
-    return None
-
-def extract_iris_features(image, circle):
-    """Extract iris features"""
-    if circle is None:
-        return None
-
-    x, y, r = circle
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-    mask = np.zeros(gray.shape[:2], dtype="uint8")
-    cv2.circle(mask, (x, y), r, 255, -1)
-
-    iris_region = cv2.bitwise_and(gray, gray, mask=mask)
-
-    iris_cropped = iris_region[max(0, y-r):min(gray.shape[0], y+r),
-                               max(0, x-r):min(gray.shape[1], x+r)]
-
-    if iris_cropped.size == 0:
-        return None
-
-    iris_normalized = cv2.resize(iris_cropped, (128, 128))
-
-    features = []
-
-    center = (64, 64)
-    for radius in [20, 35, 50]:
-        ring_mask = np.zeros((128, 128), dtype=np.uint8)
-        cv2.circle(ring_mask, center, radius, 255, 3)
-        ring_pixels = iris_normalized[ring_mask > 0]
-
-        if len(ring_pixels) > 0:
-            features.extend([
-                np.mean(ring_pixels),
-                np.std(ring_pixels),
-                np.median(ring_pixels),
-                np.var(ring_pixels)
-            ])
-
-    block_size = 16
-    for i in range(0, 128, block_size):
-        for j in range(0, 128, block_size):
-            block = iris_normalized[i:i+block_size, j:j+block_size]
-            if block.size > 0:
-                features.extend([
-                    np.mean(block),
-                    np.std(block)
-                ])
-
-    return np.array(features)
-
 def validate_inputs():
     return (user_entry.get().strip() != "" and
             aadhar_entry.get().strip() != "" and
@@ -144,14 +88,24 @@ def register_multimodal():
         messagebox.showerror("Error", "Please fill all fields: Name, Aadhar Number and DOB")
         return
 
-    user_name = user_entry.get().lower().strip()
-    aadhar = aadhar_entry.get().strip()
+    user_name = normalize_name(user_entry.get())
+    aadhar = normalize_aadhar(aadhar_entry.get()) or ""
     dob_str = dob_entry.get().strip()
 
-    if len(aadhar) != 12 or not aadhar.isdigit():
+    if not valid_name(user_name):
+        messagebox.showerror("Error", "Name must not contain / \\ : or start with a dot")
+        return
+
+    if len(aadhar) != 12:
         messagebox.showerror("Error", "Aadhar Number must be 12 digits")
         return
 
+    holder = registry.aadhar_holder(aadhar)
+    if holder is not None and holder != user_name:
+        messagebox.showerror("Duplicate Registration", f"This Aadhar Number is already registered to {holder}")
+        speak("This Aadhar Number is already registered")
+        return
+
     # Age check
     if not is_18_or_above(dob_str):
         messagebox.showerror("Not Eligible", "You are not 18 and you are not eligible to vote")
@@ -166,6 +120,12 @@ def register_multimodal():
 
     face_registered = False
     iris_registered = False
+    duplicate_of = None
+    # Captures are only enrolled once the Aadhar claim succeeds, so an abort or
+    # a lost race with another kiosk leaves nothing behind
+    face_embedding = None
+    iris_features = None
+    iris_code = None
 
     print("[INFO] Registration started. Press 'f' to capture face, 'i' to capture iris")
 
@@ -176,9 +136,12 @@ def register_multimodal():
 
         display_frame = frame.copy()
 
+        # One detection pass per frame: the face boxes and the eye keypoints
+        # used to locate the iris come from the same result
+        faces = face_model.get(frame)
+
         # Face detection
         if not face_registered:
-            faces = face_model.get(frame)
             for face in faces:
                 bbox = face.bbox.astype(int)
                 cv2.rectangle(display_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 255, 0), 2)
@@ -186,8 +149,9 @@ def register_multimodal():
                             cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
 
         # Iris detection
+        circle = None
         if not iris_registered:
-            circle = detect_iris(frame)
+            circle = locate_iris(frame, faces)
             if circle is not None:
                 x, y, r = circle
                 cv2.circle(display_frame, (x, y), r, (255, 0, 0), 2)
@@ -204,26 +168,32 @@ def register_multimodal():
 
         # Save face
         if key == ord('f') and not face_registered:
-            faces = face_model.get(frame)
             if faces:
                 face = faces[0]
-                np.save(f"data/embeddings/face_{user_name}.npy", face.normed_embedding)
+                face_index.refresh(embedding_store)
+                duplicates = face_index.find_duplicates(face.normed_embedding, exclude=user_name)
+                if duplicates:
+                    duplicate_of = duplicates[0]
+                    print(f"[WARNING] Face already enrolled as {duplicate_of[0]} (similarity {duplicate_of[1]:.3f})")
+                    break
+                face_embedding = face.normed_embedding
                 face_registered = True
-                speak("Face registered successfully")
-                print("[INFO] Face registered successfully")
+                speak("Face captured successfully")
+                print("[INFO] Face captured successfully")
 
         # Save iris
         if key == ord('i') and not iris_registered:
-            circle = detect_iris(frame)
             if circle is not None:
                 iris_features = extract_iris_features(frame, circle)
-                if iris_features is not None:
-                    np.save(f"data/embeddings/iris_{user_name}.npy", iris_features)
+                iris_code = make_template(frame, circle) if iris_features is not None else None
+                # The store is append-only, so an iris without a code would leave a
+                # re-registering voter's old code in force
+                if iris_code is not None:
                     iris_registered = True
-                    speak("Iris registered successfully")
-                    print("[INFO] Iris registered successfully")
+                    speak("Iris captured successfully")
+                    print("[INFO] Iris captured successfully")
                 else:
-                    print("[WARNING] Could not extract iris features. Try again.")
+                    print("[WARNING] Could not extract iris features and code. Try again.")
 
         if key == ord('q'):
             break
@@ -231,6 +201,12 @@ def register_multimodal():
     cap.release()
     cv2.destroyAllWindows()
 
+    if duplicate_of is not None:
+        messagebox.showerror("Duplicate Registration",
+                             f"This face is already registered as {duplicate_of[0]}")
+        speak("This face is already registered")
+        return
+
     if face_registered and iris_registered:
         details_file = f"registered_faces/{user_name}_details.json"
         details = {
@@ -239,6 +215,16 @@ def register_multimodal():
             "biometrics": ["face", "iris"],
             "registration_date": datetime.datetime.now().isoformat()
         }
+        # Atomic check-and-set, in case another kiosk registered this Aadhar meanwhile
+        holder = registry.claim_registrations([registration_row(user_name, details)])[0]
+        if holder is not None:
+            messagebox.showerror("Duplicate Registration", f"This Aadhar Number is already registered to {holder}")
+            return
+
+        embedding_store.append("face", user_name, face_embedding)
+        embedding_store.append("iris", user_name, iris_features)
+        embedding_store.append("iris_code", user_name, iris_code)
+        face_index.refresh(embedding_store)
         with open(details_file, "w") as f:
             json.dump(details, f, indent=2)
 
@@ -254,96 +240,40 @@ def multimodal_vote():
         messagebox.showerror("Error", "Please fill all fields: Name, Aadhar Number and DOB")
         return
 
-    user_name = user_entry.get().lower().strip()
-    aadhar = aadhar_entry.get().strip()
+    user_name = normalize_name(user_entry.get())
+    aadhar = normalize_aadhar(aadhar_entry.get())
 
-    if user_name in voted_users:
+    if vote_tally.has_voted(user_name) or (election_db is not None and election_db.has_voted(user_name)):
         messagebox.showerror("Error", f"{user_name} has already voted!")
         speak(f"{user_name}, you have already voted")
         return
 
-    face_path = f"data/embeddings/face_{user_name}.npy"
-    iris_path = f"data/embeddings/iris_{user_name}.npy"
-    details_file = f"registered_faces/{user_name}_details.json"
-
-    if not all(os.path.exists(path) for path in [face_path, iris_path, details_file]):
+    registration = registry.get_registration(user_name)
+    if not (embedding_store.has("face", user_name) and embedding_store.has("iris", user_name)
+            and registration is not None):
         messagebox.showerror("Error", "Complete biometric registration not found")
         return
 
-    with open(details_file, "r") as f:
-        details = json.load(f)
-    if details.get("aadhar") != aadhar:
+    if registration["aadhar"] != aadhar:
         messagebox.showerror("Error", "Aadhar Number does not match registration")
         return
 
-    registered_face = np.load(face_path)
-    registered_iris = np.load(iris_path)
+    # Pick up voters enrolled or re-enrolled at other kiosks
+    face_index.refresh(embedding_store)
+    verifier = MultimodalVerifier(face_model, face_index, user_name,
+                                  embedding_store.get("iris", user_name), face_metric="l2",
+                                  registered_iris_code=embedding_store.get("iris_code", user_name))
 
-    cap = cv2.VideoCapture(0)
     speak(f"{user_name}, please show your face and iris for verification")
-
-    face_verified = False
-    iris_verified = False
-    face_confidence = 0.0
-    iris_confidence = 0.0
-    attempts = 0
-
     print("[INFO] Verification started. Looking for face and iris...")
 
-    while attempts < 200 and not (face_verified and iris_verified):
-        ret, frame = cap.read()
-        if not ret:
-            continue
-
-        display_frame = frame.copy()
-
-        # Face verification
-        faces = face_model.get(frame)
-        for face in faces:
-            bbox = face.bbox.astype(int)
-            face_dist = np.linalg.norm(face.normed_embedding - registered_face)
-            face_confidence = float(max(0, 1 - face_dist))
-
-            color = (0, 255, 0) if face_dist < 1.2 else (0, 0, 255)
-            cv2.rectangle(display_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-            cv2.putText(display_frame, f"Face: {face_confidence:.2f}",
-                        (bbox[0], bbox[1]-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            if face_dist < 1.2:
-                face_verified = True
-
-        # Iris verification
-        circle = detect_iris(frame)
-        if circle is not None:
-            x, y, r = circle
-            iris_features = extract_iris_features(frame, circle)
-            if iris_features is not None and len(iris_features) == len(registered_iris):
-                iris_dist = euclidean(registered_iris, iris_features)
-                max_distance = 2000
-                iris_confidence = float(max(0, 1 - (iris_dist / max_distance)))
-
-                color = (255, 0, 0) if iris_dist < 1000 else (0, 0, 255)
-                cv2.circle(display_frame, (x, y), r, color, 2)
-                cv2.putText(display_frame, f"Iris: {iris_confidence:.2f}",
-                            (x-50, y-r-20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-                if iris_dist < 1000:
-                    iris_verified = True
-
-        status = f"Face: {'✓' if face_verified else '✗'} | Iris: {'✓' if iris_verified else '✗'}"
-        cv2.putText(display_frame, status, (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-        cv2.imshow("Multimodal Voting Verification", display_frame)
-        if cv2.waitKey(1) == ord('q'):
-            break
-        attempts += 1
-
-    cap.release()
+    result = verifier.verify(camera_frames(), on_frame=window_callback("Multimodal Voting Verification"))
     cv2.destroyAllWindows()
 
-    combined_score = float((face_confidence * 0.6) + (iris_confidence * 0.4))
-    final_verified = (face_verified and iris_verified) or (combined_score > 0.65)
+    face_verified, face_confidence = result["face_verified"], result["face_confidence"]
+    iris_verified, iris_confidence = result["iris_verified"], result["iris_confidence"]
+    combined_score = result["combined_score"]
+    final_verified = result["verified"]
 
     print(f"[INFO] Face: {face_verified} ({face_confidence:.3f}), Iris: {iris_verified} ({iris_confidence:.3f})")
     print(f"[INFO] Combined Score: {combined_score:.3f}, Final: {final_verified}")
@@ -356,19 +286,33 @@ def multimodal_vote():
                              f"Multimodal verification failed. Combined score: {combined_score:.2f}")
         speak("Biometric verification failed")
 
+def store_vote(user_name, party, vote_record):
+    """Record a vote through the shared vote writer; returns "recorded", "duplicate" or "error" """
+    try:
+        return record_vote(user_name, party, "GUI", vote_record)
+    except (VoteOutcomeUnknown, VoteWriterUnavailable) as e:
+        print(f"[ERROR] {e}")
+        return "error"
+
 def show_vote_options(user_name, verification_score):
+    ballot = get_ballot()
+
     def record_vote(party):
         vote_record = {
-            "party": party,
+            "code": ballot.code_of(party),
             "verification_score": float(verification_score),
             "timestamp": datetime.datetime.now().isoformat(),
             "verification_method": "multimodal"
         }
 
-        voted_users[user_name] = convert_numpy_types(vote_record)
-
-        with open(voted_users_file, "w") as f:
-            json.dump(voted_users, f, indent=2)
+        status = store_vote(user_name, party, convert_numpy_types(vote_record))
+        if status != "recorded":
+            if status == "duplicate":
+                messagebox.showerror("Error", f"{user_name} has already voted!")
+            else:
+                messagebox.showerror("Error", "Your vote could not be confirmed. Please contact booth staff.")
+            vote_window.destroy()
+            return
 
         messagebox.showinfo("Vote Recorded", f"Your vote for {party} has been recorded")
         speak(f"Your vote for {party} has been recorded. Thank you for voting.")
@@ -376,7 +320,7 @@ def show_vote_options(user_name, verification_score):
 
     vote_window = tk.Toplevel(root)
     vote_window.title("Cast Your Vote")
-    vote_window.geometry("400x400")
+    vote_window.geometry(f"400x{140 + 66 * len(ballot.parties)}")
     vote_window.configure(bg="lightblue")
 
     tk.Label(vote_window, text="🗳️ CAST YOUR VOTE 🗳️",
@@ -384,12 +328,9 @@ def show_vote_options(user_name, verification_score):
     tk.Label(vote_window, text=f"Verification Score: {float(verification_score):.2f}",
              font=("Arial", 10), fg="gray", bg="lightblue").pack()
 
-    parties = ["BJP", "Congress", "JD(S)", "AAP"]
-    colors = ["orange", "lightgreen", "yellow", "lightcoral"]
-
-    for i, (party, color) in enumerate(zip(parties, colors), 1):
+    for i, party in enumerate(ballot.parties, 1):
         btn = tk.Button(vote_window, text=f"{i}. {party}", font=("Arial", 12, "bold"),
-                        width=20, height=2, bg=color,
+                        width=20, height=2, bg=ballot.color_of(party),
                         command=lambda p=party: record_vote(p))
         btn.pack(pady=8)
 
@@ -0,0 +1,187 @@
+import cv2
+import numpy as np
+
+from iris_features import to_gray
+
+# Rubber-sheet resolution: radial samples x angular samples
+RADIAL_SAMPLES = 8
+ANGULAR_SAMPLES = 128
+# Pupil radius as a fraction of the iris radius (the detector only finds the
+# outer boundary, so the inner one is assumed)
+PUPIL_RATIO = 0.4
+
+# 1-D log-Gabor filter bank applied along the angular direction
+WAVELENGTHS = (16, 32)
+SIGMA_ON_F = 0.5
+
+# Each angular column carries RADIAL_SAMPLES x filters x 2 phase bits
+BITS_PER_COLUMN = RADIAL_SAMPLES * len(WAVELENGTHS) * 2
+CODE_BITS = ANGULAR_SAMPLES * BITS_PER_COLUMN
+CODE_BYTES = CODE_BITS // 8
+BYTES_PER_COLUMN = BITS_PER_COLUMN // 8
+# Stored template = packed code followed by packed mask
+TEMPLATE_BYTES = 2 * CODE_BYTES
+
+# Rotation tolerance in angular columns (each is 360 / ANGULAR_SAMPLES degrees)
+MAX_SHIFT = 8
+HAMMING_THRESHOLD = 0.32
+# Distance mapped to zero confidence, so the threshold scores 0.5 like the
+# statistical templates did
+HAMMING_MAX_DISTANCE = 0.64
+
+# Fraction of the median filter amplitude below which a phase bit is unreliable
+MIN_AMPLITUDE = 0.1
+
+
+def _unit_grid():
+    radii = (np.arange(RADIAL_SAMPLES, dtype=np.float32) + 0.5) / RADIAL_SAMPLES
+    theta = np.arange(ANGULAR_SAMPLES, dtype=np.float32) * (2 * np.pi / ANGULAR_SAMPLES)
+    return radii[:, np.newaxis], np.cos(theta)[np.newaxis, :], np.sin(theta)[np.newaxis, :]
+
+
+def _log_gabor_bank():
+    freqs = np.fft.fftfreq(ANGULAR_SAMPLES)
+    bank = np.zeros((len(WAVELENGTHS), ANGULAR_SAMPLES))
+    positive = freqs > 0
+    for i, wavelength in enumerate(WAVELENGTHS):
+        f0 = 1.0 / wavelength
+        bank[i, positive] = np.exp(-(np.log(freqs[positive] / f0) ** 2) /
+                                   (2 * np.log(SIGMA_ON_F) ** 2))
+    return bank
+
+
+UNIT_RADII, COS_THETA, SIN_THETA = _unit_grid()
+LOG_GABOR_BANK = _log_gabor_bank()
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def as_words(bytes_array):
+    """View packed bits as 64-bit words when the popcount can use them"""
+    if hasattr(np, "bitwise_count"):
+        return np.ascontiguousarray(bytes_array).view(np.uint64)
+    return bytes_array
+
+
+def popcount(array, axis=-1):
+    """Number of set bits along an axis of a packed uint8 / uint64 array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(array).sum(axis=axis, dtype=np.int64)
+    return POPCOUNT_TABLE[array].sum(axis=axis, dtype=np.int64)
+
+
+def normalize_iris(image, circle):
+    """Daugman rubber-sheet unwrap of the iris annulus.
+
+    Returns (polar, valid) arrays of shape (RADIAL_SAMPLES, ANGULAR_SAMPLES):
+    the sampled intensities and a mask of samples that fell inside the frame
+    and are not specular highlights.
+    """
+    gray = to_gray(image).astype(np.float32)
+    x, y, r = (float(v) for v in circle)
+    pupil = PUPIL_RATIO * r
+    radius = pupil + UNIT_RADII * (r - pupil)
+    map_x = (x + radius * COS_THETA).astype(np.float32)
+    map_y = (y + radius * SIN_THETA).astype(np.float32)
+
+    polar = cv2.remap(gray, map_x, map_y, cv2.INTER_LINEAR,
+                      borderMode=cv2.BORDER_CONSTANT, borderValue=-1)
+    valid = (polar >= 0) & (polar < 250)
+    return polar, valid
+
+
+def encode_iris(image, circle):
+    """Return (code, mask) packed uint8 arrays of CODE_BYTES each"""
+    polar, valid = normalize_iris(image, circle)
+    if not valid.any():
+        return None
+
+    # Zero-mean each ring so invalid samples do not bias the filter response
+    fill = np.where(valid, polar, np.nan)
+    ring_mean = np.nanmean(fill, axis=1, keepdims=True)
+    signal = np.where(valid, polar, ring_mean) - ring_mean
+
+    # Filter every ring with every wavelength in one FFT pass:
+    # (filters, radial, angular) complex responses
+    spectrum = np.fft.fft(signal, axis=1)
+    response = np.fft.ifft(spectrum[np.newaxis, :, :] * LOG_GABOR_BANK[:, np.newaxis, :], axis=2)
+
+    amplitude = np.abs(response)
+    strong = amplitude > MIN_AMPLITUDE * max(float(np.median(amplitude)), 1e-6)
+    bits = np.stack([response.real > 0, response.imag > 0], axis=-1)
+    bit_mask = np.stack([strong & valid[np.newaxis], strong & valid[np.newaxis]], axis=-1)
+
+    # Angular axis first, so a rotation is a whole-byte roll of the packed code
+    bits = bits.transpose(2, 1, 0, 3).reshape(-1)
+    bit_mask = bit_mask.transpose(2, 1, 0, 3).reshape(-1)
+    return np.packbits(bits), np.packbits(bit_mask)
+
+
+def make_template(image, circle):
+    """Packed code + mask as one TEMPLATE_BYTES uint8 vector, or None"""
+    if circle is None:
+        return None
+    encoded = encode_iris(image, circle)
+    if encoded is None:
+        return None
+    return np.concatenate(encoded)
+
+
+def split_template(template):
+    template = np.asarray(template, dtype=np.uint8)
+    return template[..., :CODE_BYTES], template[..., CODE_BYTES:]
+
+
+def shifted_codes(code, mask, max_shift=MAX_SHIFT):
+    """All rotations of a probe within +/- max_shift columns, as (S, CODE_BYTES)"""
+    shifts = np.arange(-max_shift, max_shift + 1)
+    index = (np.arange(CODE_BYTES)[np.newaxis, :] -
+             shifts[:, np.newaxis] * BYTES_PER_COLUMN) % CODE_BYTES
+    return code[index], mask[index], shifts
+
+
+def hamming_distances(probe_template, gallery_templates, max_shift=MAX_SHIFT, chunk=4096):
+    """Masked fractional Hamming distance of a probe against every template.
+
+    Returns (distances, shifts): the best distance over all rotations and the
+    rotation (in angular columns) that produced it, for each gallery row.
+    """
+    probe_code, probe_mask = split_template(probe_template)
+    codes, masks, shifts = shifted_codes(probe_code, probe_mask, max_shift)
+    codes, masks = as_words(codes), as_words(masks)
+    gallery = np.atleast_2d(np.asarray(gallery_templates, dtype=np.uint8))
+    gallery_codes, gallery_masks = (as_words(part) for part in split_template(gallery))
+
+    distances = np.empty(gallery.shape[0])
+    best_shifts = np.empty(gallery.shape[0], dtype=np.int64)
+    for start in range(0, gallery.shape[0], chunk):
+        g_codes = gallery_codes[start:start + chunk, np.newaxis, :]
+        g_masks = gallery_masks[start:start + chunk, np.newaxis, :]
+        valid = g_masks & masks[np.newaxis]
+        disagree = popcount((g_codes ^ codes[np.newaxis]) & valid)
+        total = popcount(valid)
+        hd = np.where(total > 0, disagree / np.maximum(total, 1), 1.0)
+        best = hd.argmin(axis=1)
+        distances[start:start + chunk] = hd[np.arange(hd.shape[0]), best]
+        best_shifts[start:start + chunk] = shifts[best]
+    return distances, best_shifts
+
+
+def hamming_distance(probe_template, template, max_shift=MAX_SHIFT):
+    """Best masked Hamming distance between two templates over rotations"""
+    distances, _ = hamming_distances(probe_template, template, max_shift)
+    return float(distances[0])
+
+
+def confidence(distance):
+    return float(max(0, 1 - distance / HAMMING_MAX_DISTANCE))
+
+
+def search(probe_template, names, gallery_templates, k=5, max_shift=MAX_SHIFT):
+    """1:N iris search; returns the k closest (name, distance) pairs"""
+    if len(names) == 0:
+        return []
+    distances, _ = hamming_distances(probe_template, gallery_templates, max_shift)
+    k = min(k, len(names))
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top])]
+    return [(names[i], float(distances[i])) for i in top]
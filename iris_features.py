@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+
+# Layout of the 140-value iris template:
+#   3 rings   x (mean, std, median, var) -> 12 values
+#   8x8 blocks x (mean, std)             -> 128 values
+IRIS_SIZE = 128
+RING_RADII = (20, 35, 50)
+RING_THICKNESS = 3
+BLOCK_SIZE = 16
+FEATURE_LENGTH = len(RING_RADII) * 4 + (IRIS_SIZE // BLOCK_SIZE) ** 2 * 2
+
+
+def _ring_indices():
+    """Flat pixel indices of each feature ring, drawn once with cv2.circle"""
+    center = (IRIS_SIZE // 2, IRIS_SIZE // 2)
+    indices = []
+    for radius in RING_RADII:
+        ring_mask = np.zeros((IRIS_SIZE, IRIS_SIZE), dtype=np.uint8)
+        cv2.circle(ring_mask, center, radius, 255, RING_THICKNESS)
+        indices.append(np.flatnonzero(ring_mask))
+    return indices
+
+
+RING_INDICES = _ring_indices()
+
+
+def to_gray(image):
+    """Return a single-channel view of the image, converting only if needed"""
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def crop_iris(gray, circle):
+    """Masked, cropped and 128x128-resized iris region, or None if empty"""
+    x, y, r = (int(v) for v in circle)
+    top, bottom = max(0, y - r), min(gray.shape[0], y + r)
+    left, right = max(0, x - r), min(gray.shape[1], x + r)
+    crop = gray[top:bottom, left:right]
+    if crop.size == 0:
+        return None
+
+    # Mask only the crop rather than the whole frame
+    mask = np.zeros(crop.shape, dtype=np.uint8)
+    cv2.circle(mask, (x - left, y - top), r, 255, -1)
+    crop = cv2.bitwise_and(crop, crop, mask=mask)
+    return cv2.resize(crop, (IRIS_SIZE, IRIS_SIZE))
+
+
+def features_from_normalized(batch):
+    """Feature matrix (N, 140) float32 for a stack of 128x128 iris images"""
+    batch = np.asarray(batch)
+    if batch.ndim == 2:
+        batch = batch[np.newaxis]
+    n = batch.shape[0]
+    pixels = batch.reshape(n, -1).astype(np.float64)
+
+    ring_features = []
+    for indices in RING_INDICES:
+        ring = pixels[:, indices]
+        ring_features.append(np.stack([
+            ring.mean(axis=1),
+            ring.std(axis=1),
+            np.median(ring, axis=1),
+            ring.var(axis=1)
+        ], axis=1))
+
+    blocks_per_side = IRIS_SIZE // BLOCK_SIZE
+    blocks = (pixels.reshape(n, blocks_per_side, BLOCK_SIZE, blocks_per_side, BLOCK_SIZE)
+                    .transpose(0, 1, 3, 2, 4)
+                    .reshape(n, blocks_per_side * blocks_per_side, BLOCK_SIZE * BLOCK_SIZE))
+    block_features = np.stack([blocks.mean(axis=2), blocks.std(axis=2)], axis=2).reshape(n, -1)
+
+    return np.concatenate(ring_features + [block_features], axis=1).astype(np.float32)
+
+
+def features_from_crops(crops):
+    """Feature matrix for a batch of iris crops of any size (gray or BGR)"""
+    normalized = [cv2.resize(to_gray(crop), (IRIS_SIZE, IRIS_SIZE)) for crop in crops]
+    if not normalized:
+        return np.zeros((0, FEATURE_LENGTH), dtype=np.float32)
+    return features_from_normalized(np.stack(normalized))
+
+
+def extract_iris_features(image, circle):
+    """Extract iris features using texture analysis.
+
+    `image` may be BGR or already grayscale (as produced by detect_iris).
+    """
+    if circle is None:
+        return None
+    normalized = crop_iris(to_gray(image), circle)
+    if normalized is None:
+        return None
+    return features_from_normalized(normalized)[0]
+
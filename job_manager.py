@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+# Jobs waiting or running at once; further submissions are refused
+JOB_QUEUE_LIMIT = int(os.environ.get("JOB_QUEUE_LIMIT", "8"))
+# Finished jobs kept around for status queries
+JOB_HISTORY = 100
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already queued"""
+
+
+class Job:
+    def __init__(self, key, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.name = name
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def update(self, progress, message=None):
+        """Called by the job function to report progress in [0, 1]"""
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            self.message = message
+
+    def to_dict(self):
+        elapsed = None
+        if self.started:
+            elapsed = (self.finished or time.time()) - self.started
+        return {
+            'job_id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'elapsed': elapsed,
+        }
+
+
+class JobManager:
+    """In-process background jobs on a bounded thread pool.
+
+    `submit` returns at once with a Job whose id can be polled. A job is
+    keyed (e.g. on the data version it works from): while one is queued or
+    running, submitting the same key again returns that job instead of
+    starting a duplicate.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT, history=JOB_HISTORY):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.queue_limit = queue_limit
+        self.history = history
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.active = {}
+
+    def submit(self, key, fn, name=""):
+        """Run fn(job) in the background; returns (job, created)"""
+        with self.lock:
+            job = self.active.get(key)
+            if job is not None:
+                return job, False
+            if len(self.active) >= self.queue_limit:
+                raise JobQueueFull(f"{len(self.active)} jobs already queued")
+            job = Job(key, name)
+            self.jobs[job.id] = job
+            self.active[key] = job
+            while len(self.jobs) > self.history:
+                oldest = next(iter(self.jobs.values()))
+                if oldest.status in ("queued", "running"):
+                    break
+                self.jobs.popitem(last=False)
+        self.pool.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job, fn):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job)
+            job.progress = 1.0
+            job.status = "done"
+        except Exception as e:
+            print(f"[ERROR] Job {job.name} {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                if self.active.get(job.key) is job:
+                    del self.active[job.key]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
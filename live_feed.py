@@ -0,0 +1,102 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# How often the single background poller checks whether results moved
+LIVE_POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL", "0.5"))
+# Comment line sent to idle streams so proxies keep the connection open
+HEARTBEAT_INTERVAL = 15
+
+
+def party_delta(old, new):
+    """{party: change in votes} between two stats dicts"""
+    old_parties = old.get('parties', {}) if old else {}
+    parties = set(old_parties) | set(new.get('parties', {}))
+    delta = {party: new['parties'].get(party, 0) - old_parties.get(party, 0) for party in parties}
+    return {party: change for party, change in delta.items() if change}
+
+
+class LiveFeed:
+    """Pushes results to every connected dashboard when, and only when, they change.
+
+    One poller thread asks `version()` (a few stat() calls for the vote
+    logs) whether anything moved and only then calls `snapshot()` once,
+    fanning the event out to every subscriber's queue. The per-dashboard cost
+    is an idle connection.
+    """
+
+    def __init__(self, snapshot, version, interval=LIVE_POLL_INTERVAL):
+        self.snapshot = snapshot
+        self.version = version
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.current = None
+        self.current_version = None
+        self.thread = None
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=8)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            current = self.current
+        if current is not None:
+            subscriber.put(current)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self.lock:
+            self.current = event
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A slow client only needs the latest state; drop its oldest event
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(event)
+
+    def poll(self):
+        """Publish a new event if the results version moved; returns True if it did"""
+        version = self.version()
+        if version == self.current_version:
+            return False
+        stats = self.snapshot()
+        previous = self.current['stats'] if self.current else None
+        self.current_version = version
+        self.publish({'version': version, 'stats': stats, 'delta': party_delta(previous, stats)})
+        return True
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[ERROR] Live results poll failed: {e}")
+            time.sleep(self.interval)
+
+    def stream(self):
+        """text/event-stream body for one dashboard"""
+        subscriber = self.subscribe()
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['version']}\nevent: results\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
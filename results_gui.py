@@ -77,13 +77,15 @@ class ResultsDashboard:
     def update_stats(self):
         """Update statistics display"""
         try:
-            df = self.visualizer.prepare_combined_data()
+            # Reloads only if votes were cast since the last refresh
+            self.visualizer.load_data()
+            df = self.visualizer.results_frame()
             
             if df.empty:
                 stats_text = "No voting data available yet.\nStart voting to see statistics!"
             else:
                 total_votes = len(df)
-                vote_counts = df['party'].value_counts()
+                vote_counts = self.visualizer.party_counts(df)
                 avg_score = df['verification_score'].mean()
                 
                 stats_text = f"📊 CURRENT STATISTICS\n"
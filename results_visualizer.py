@@ -2,70 +2,137 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import json
+import hashlib
 import os
+import time
+import matplotlib
 import numpy as np
 from datetime import datetime
 import matplotlib.dates as mdates
 from collections import Counter
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+import chart_cache
+from ballot import get_ballot
+from election_db import open_db, sqlite_enabled
+from vote_log import CLI_VOTES_FILE, GUI_VOTES_FILE, open_log
 
 # Set style for better looking plots
 plt.style.use('default')  # Changed from seaborn-v0_8 for compatibility
 sns.set_palette("husl")
 
+# How charts are written: "print" is the full-size archival output, "web" a
+# small, compressed copy for dashboards and downloads over booth links
+WEB_CHART_FORMAT = os.environ.get("WEB_CHART_FORMAT", "webp")  # or "svg"
+RENDER_PROFILES = {
+    'print': {'dpi': 300, 'format': 'png', 'scale': 1.0},
+    'web': {'dpi': 100, 'format': WEB_CHART_FORMAT, 'scale': 0.6, 'quality': 80},
+}
+DEFAULT_PROFILE = 'print'
+
+# Everything besides the data and profile that decides how a chart looks;
+# part of its cache key, so editing the plotting code invalidates cached charts
+with open(__file__, "rb") as _source:
+    RENDER_PARAMS = {
+        'code': hashlib.sha256(_source.read()).hexdigest(),
+        'matplotlib': matplotlib.__version__,
+        'seaborn': sns.__version__,
+    }
+
+
+# Verification score thresholds of the security levels, and the score ranges
+SECURITY_HIGH = 0.8
+SECURITY_MEDIUM = 0.6
+SECURITY_LEVELS = ['High', 'Medium', 'Low']
+SCORE_BINS = [0, 0.5, 0.7, 0.85, 1.0]
+SCORE_RANGES = ['Low (0-0.5)', 'Medium (0.5-0.7)', 'High (0.7-0.85)', 'Very High (0.85-1.0)']
+
+
+def chart_path(name, profile=DEFAULT_PROFILE):
+    """File of a chart in results/: <name>.png for print, <name>.<profile>.<format> otherwise"""
+    if profile == 'print':
+        return os.path.join('results', f'{name}.png')
+    return os.path.join('results', f"{name}.{profile}.{RENDER_PROFILES[profile]['format']}")
+
 class VotingResultsVisualizer:
-    def __init__(self):
-        self.votes_file = "data/votes.json"
-        self.voted_users_file = "voted_users.json"
+    def __init__(self, interactive=True, load=True, profile=DEFAULT_PROFILE):
+        self.votes_file = CLI_VOTES_FILE
+        self.voted_users_file = GUI_VOTES_FILE
+        self.ballot = get_ballot()
+        self.profile = profile
+        # Headless renders only save the charts; plt.show() would block or warn
+        self.interactive = interactive
+        # One figure per chart, cleared and redrawn on every render
+        self.figures = {}
+        # Cache key of the data each chart is being drawn from
+        self.chart_keys = {}
+        self.cli_votes, self.gui_votes, self.db_votes = {}, {}, []
+        # Results frame of the loaded votes, and the data version they were loaded at
+        self.frame = None
+        self.loaded_version = None
+        self.plotters = {
+            'vote_distribution': self.plot_vote_distribution,
+            'verification_analysis': self.plot_verification_scores,
+            'biometric_analysis': self.plot_biometric_analysis,
+            'time_analysis': self.plot_time_analysis,
+        }
         self.ensure_directories()
-        self.load_data()
+        if load:
+            self.load_data()
     
     def ensure_directories(self):
         """Create necessary directories if they don't exist"""
         os.makedirs("data", exist_ok=True)
         os.makedirs("results", exist_ok=True)
     
+    def data_version(self):
+        """Cheap fingerprint of the vote sources: the database's change counter, or vote file stats"""
+        if sqlite_enabled():
+            return ('db', open_db().version())
+        version = []
+        for votes_file in (self.votes_file, self.voted_users_file):
+            for path in (votes_file, open_log(votes_file).log_path):
+                try:
+                    stat = os.stat(path)
+                    version.append((path, stat.st_mtime_ns, stat.st_size))
+                except OSError:
+                    version.append((path, None))
+        return tuple(version)
+    
     def load_data(self):
-        """Load voting data from JSON files with error handling"""
-        # Load CLI votes
-        self.cli_votes = {}
-        if os.path.exists(self.votes_file):
-            try:
-                with open(self.votes_file, "r") as f:
-                    content = f.read().strip()
-                    if content:  # Check if file is not empty
-                        self.cli_votes = json.loads(content)
-                    else:
-                        print(f"[INFO] {self.votes_file} is empty, initializing with empty dict")
-            except json.JSONDecodeError as e:
-                print(f"[WARNING] Error reading {self.votes_file}: {e}. Initializing with empty dict")
-                self.cli_votes = {}
-            except Exception as e:
-                print(f"[ERROR] Unexpected error reading {self.votes_file}: {e}")
-                self.cli_votes = {}
-        else:
-            print(f"[INFO] {self.votes_file} does not exist, initializing with empty dict")
-        
-        # Load GUI votes
-        self.gui_votes = {}
-        if os.path.exists(self.voted_users_file):
-            try:
-                with open(self.voted_users_file, "r") as f:
-                    content = f.read().strip()
-                    if content:  # Check if file is not empty
-                        self.gui_votes = json.loads(content)
-                    else:
-                        print(f"[INFO] {self.voted_users_file} is empty, initializing with empty dict")
-            except json.JSONDecodeError as e:
-                print(f"[WARNING] Error reading {self.voted_users_file}: {e}. Initializing with empty dict")
-                self.gui_votes = {}
-            except Exception as e:
-                print(f"[ERROR] Unexpected error reading {self.voted_users_file}: {e}")
-                self.gui_votes = {}
+        """Load voting data (snapshot + vote log) with error handling; a no-op if nothing changed"""
+        version = self.data_version()
+        if self.frame is not None and version == self.loaded_version:
+            return
+        self.cli_votes, self.gui_votes, self.db_votes = {}, {}, []
+        self.frame = None
+        self.loaded_version = version
+        if sqlite_enabled():
+            # The database is the only source in SQLite mode; the JSON files
+            # may still hold votes that were already imported into it
+            self.db_votes = open_db().votes()
         else:
-            print(f"[INFO] {self.voted_users_file} does not exist, initializing with empty dict")
-        
-        print(f"[INFO] Loaded {len(self.cli_votes)} CLI votes and {len(self.gui_votes)} GUI votes")
+            # Load CLI votes
+            self.cli_votes = self.load_votes_file(self.votes_file)
+
+            # Load GUI votes
+            self.gui_votes = self.load_votes_file(self.voted_users_file)
+
+        print(f"[INFO] Loaded {len(self.cli_votes)} CLI votes, {len(self.gui_votes)} GUI votes "
+              f"and {len(self.db_votes)} database votes")
     
+    def load_votes_file(self, votes_file):
+        """Replay one vote snapshot and its append-only log"""
+        log = open_log(votes_file)
+        if not os.path.exists(votes_file) and not os.path.exists(log.log_path):
+            print(f"[INFO] {votes_file} does not exist, initializing with empty dict")
+            return {}
+        try:
+            return log.load()
+        except Exception as e:
+            print(f"[ERROR] Unexpected error reading {votes_file}: {e}")
+            return {}
+
     def create_sample_data(self):
         """Create sample data for demonstration purposes"""
         sample_data = {
@@ -106,72 +173,162 @@ class VotingResultsVisualizer:
             }
         }
         
-        # Save sample data
+        # Save sample data (replacing any votes still pending in the log)
+        open_log(self.votes_file).clear()
         with open(self.votes_file, "w") as f:
             json.dump(sample_data, f, indent=2)
         
         print("[INFO] Sample data created for demonstration")
         self.cli_votes = sample_data
+        self.frame = None
     
     def prepare_combined_data(self):
-        """Combine and prepare data from both voting methods"""
-        combined_data = []
-        
-        # Process CLI votes
-        for user, vote_data in self.cli_votes.items():
-            if isinstance(vote_data, dict):
-                combined_data.append({
-                    'user': user,
-                    'party': self.get_party_name(vote_data.get('choice', 'Unknown')),
-                    'verification_score': vote_data.get('verification_score', 0),
-                    'timestamp': vote_data.get('timestamp', ''),
-                    'method': 'CLI',
-                    'face_verified': vote_data.get('face_verified', False),
-                    'iris_verified': vote_data.get('iris_verified', False)
-                })
-        
-        # Process GUI votes
-        for user, vote_data in self.gui_votes.items():
-            if isinstance(vote_data, dict):
-                combined_data.append({
-                    'user': user,
-                    'party': vote_data.get('party', 'Unknown'),
-                    'verification_score': vote_data.get('verification_score', 0),
-                    'timestamp': vote_data.get('timestamp', ''),
-                    'method': 'GUI',
-                    'face_verified': True,  # GUI requires both
-                    'iris_verified': True
-                })
-        
-        return pd.DataFrame(combined_data)
+        """Combine the votes of every source into one columnar results frame.
+
+        Columns are collected as arrays rather than row dicts: integer
+        candidate codes, categorical party and method, parsed datetimes (NaT
+        when missing) and the score buckets the charts and report group by.
+        Use results_frame() for the copy cached per data version.
+        """
+        ballot = self.ballot
+        users, codes, scores, timestamps, methods, face, iris = [], [], [], [], [], [], []
+        
+        # CLI and GUI votes (the GUI requires both biometrics)
+        for method, votes in (('CLI', self.cli_votes), ('GUI', self.gui_votes)):
+            for user, vote_data in votes.items():
+                if isinstance(vote_data, dict):
+                    users.append(user)
+                    codes.append(ballot.record_code(vote_data))
+                    scores.append(vote_data.get('verification_score') or 0)
+                    timestamps.append(vote_data.get('timestamp') or '')
+                    methods.append(method)
+                    face.append(method == 'GUI' or bool(vote_data.get('face_verified', False)))
+                    iris.append(method == 'GUI' or bool(vote_data.get('iris_verified', False)))
+        
+        # Process database votes
+        for vote_data in self.db_votes:
+            users.append(vote_data['voter_id'])
+            codes.append(ballot.code_of(vote_data['party']))
+            scores.append(vote_data['verification_score'] or 0)
+            timestamps.append(vote_data['timestamp'] or '')
+            methods.append(vote_data['method'])
+            face.append(bool(vote_data['face_verified']))
+            iris.append(bool(vote_data['iris_verified']))
+        
+        codes = np.asarray(codes, dtype=np.int64)
+        scores = np.asarray(scores, dtype=float)
+        timestamps = pd.Series(timestamps, dtype=object)
+        return pd.DataFrame({
+            'user': users,
+            'code': codes,
+            'party': pd.Categorical(np.asarray(ballot.names, dtype=object)[codes]),
+            'verification_score': scores,
+            'timestamp': timestamps,
+            'datetime': pd.to_datetime(timestamps, errors='coerce', format='ISO8601'),
+            'method': pd.Categorical(methods),
+            'face_verified': np.asarray(face, dtype=bool),
+            'iris_verified': np.asarray(iris, dtype=bool),
+            'security_level': pd.Categorical(
+                np.select([scores >= SECURITY_HIGH, scores >= SECURITY_MEDIUM], ['High', 'Medium'], 'Low'),
+                categories=SECURITY_LEVELS),
+            'score_range': pd.cut(scores, bins=SCORE_BINS, labels=SCORE_RANGES),
+        })
     
-    def get_party_name(self, choice):
-        """Convert choice number to party name"""
-        party_map = {
-            '1': 'BJP',
-            '2': 'Congress',
-            '3': 'AAP',
-            '4': 'Others'
-        }
-        return party_map.get(str(choice), 'Unknown')
+    def results_frame(self):
+        """The results frame of the loaded votes, built once per data version"""
+        if self.frame is None:
+            self.frame = self.prepare_combined_data()
+        return self.frame
     
-    def plot_vote_distribution(self):
-        """Create pie chart and bar chart for vote distribution"""
-        df = self.prepare_combined_data()
+    def chart_data(self):
+        """Combined votes for the charts, sample data if there are none yet; None if still empty"""
+        df = self.results_frame()
         
         if df.empty:
             print("[WARNING] No voting data available. Creating sample data...")
             self.create_sample_data()
-            df = self.prepare_combined_data()
+            df = self.results_frame()
         
         if df.empty:
             print("[ERROR] Still no data available")
-            return
+            return None
+        return df
+    
+    def figure(self, name, nrows, ncols, figsize):
+        """The chart's figure, cleared, with a fresh nrows x ncols grid of axes"""
+        scale = RENDER_PROFILES[self.profile]['scale']
+        figsize = (figsize[0] * scale, figsize[1] * scale)
+        fig = self.figures.get(name)
+        if fig is None or (self.interactive and not plt.fignum_exists(fig.number)):
+            fig = plt.figure(figsize=figsize)
+            self.figures[name] = fig
+        else:
+            fig.clf()
+            fig.set_size_inches(figsize)
+        return fig, fig.subplots(nrows, ncols)
+
+    def cached(self, name, df):
+        """True if the chart was restored from the chart cache for this data and profile.
+
+        Interactive sessions always draw, since they show the figure.
+        """
+        self.chart_keys.pop(name, None)
+        if self.interactive:
+            return False
+        params = dict(RENDER_PARAMS, profile=self.profile, **RENDER_PROFILES[self.profile])
+        key = chart_cache.chart_key(name, chart_cache.data_hash(df), params)
+        if chart_cache.restore(key, chart_path(name, self.profile)):
+            print(f"[INFO] {name} ({self.profile}) unchanged, served from the chart cache")
+            return True
+        self.chart_keys[name] = key
+        return False
+
+    def finish(self, fig, name, tight=True):
+        """Save a chart (and cache it), and show it when running interactively"""
+        profile = RENDER_PROFILES[self.profile]
+        path = chart_path(name, self.profile)
+        if tight:
+            fig.tight_layout()
+        options = {}
+        if profile['format'] == 'webp':
+            options['pil_kwargs'] = {'quality': profile['quality']}
+        # Written aside and swapped in: the old file may be linked to a cache entry
+        tmp = f'{path}.{os.getpid()}.tmp'
+        fig.savefig(tmp, format=profile['format'], dpi=profile['dpi'], bbox_inches='tight', **options)
+        os.replace(tmp, path)
+        key = self.chart_keys.pop(name, None)
+        if key:
+            chart_cache.store(key, path)
+        if self.interactive:
+            plt.show()
+
+    def party_counts(self, df):
+        """Votes per party, most first (bincount over the integer candidate codes)"""
+        return pd.Series(self.ballot.tally(df['code'].to_numpy()), dtype=int).sort_values(ascending=False)
+    
+    def plot_vote_distribution(self, df=None):
+        """Create pie chart and bar chart for vote distribution"""
+        if df is None:
+            df = self.chart_data()
+            if df is None:
+                return
         
         # Count votes per party
-        vote_counts = df['party'].value_counts()
+        vote_counts = self.party_counts(df)
+        
+        # Print statistics
+        total_votes = len(df)
+        print(f"\n📊 VOTING STATISTICS")
+        print(f"{'='*40}")
+        print(f"Total Votes Cast: {total_votes}")
+        for party, count in vote_counts.items():
+            percentage = (count/total_votes)*100
+            print(f"{party}: {count} votes ({percentage:.1f}%)")
         
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+        if self.cached('vote_distribution', df):
+            return
+        
+        fig, (ax1, ax2) = self.figure('vote_distribution', 1, 2, (15, 6))
         
         # Pie Chart
         colors = ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']
@@ -196,33 +353,19 @@ class VotingResultsVisualizer:
                     f'{int(height)}',
                     ha='center', va='bottom', fontweight='bold')
         
-        plt.tight_layout()
-        plt.savefig('results/vote_distribution.png', dpi=300, bbox_inches='tight')
-        plt.show()
-        
-        # Print statistics
-        total_votes = len(df)
-        print(f"\n📊 VOTING STATISTICS")
-        print(f"{'='*40}")
-        print(f"Total Votes Cast: {total_votes}")
-        for party, count in vote_counts.items():
-            percentage = (count/total_votes)*100
-            print(f"{party}: {count} votes ({percentage:.1f}%)")
+        self.finish(fig, 'vote_distribution')
     
-    def plot_verification_scores(self):
+    def plot_verification_scores(self, df=None):
         """Plot verification score distribution"""
-        df = self.prepare_combined_data()
+        if df is None:
+            df = self.chart_data()
+            if df is None:
+                return
         
-        if df.empty:
-            print("[WARNING] No voting data available. Creating sample data...")
-            self.create_sample_data()
-            df = self.prepare_combined_data()
-        
-        if df.empty:
-            print("[ERROR] Still no data available")
+        if self.cached('verification_analysis', df):
             return
         
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+        fig, ((ax1, ax2), (ax3, ax4)) = self.figure('verification_analysis', 2, 2, (15, 12))
         
         # Histogram of verification scores
         ax1.hist(df['verification_score'], bins=20, alpha=0.7, color='skyblue', edgecolor='black')
@@ -247,14 +390,14 @@ class VotingResultsVisualizer:
         # Verification scores by method
         method_data = []
         method_labels = []
-        for method in df['method'].unique():
-            method_scores = df[df['method'] == method]['verification_score'].tolist()
-            if method_scores:
-                method_data.append(method_scores)
-                method_labels.append(method)
+        for method, method_scores in df.groupby('method', observed=True)['verification_score']:
+            method_data.append(method_scores.to_numpy())
+            method_labels.append(method)
         
         if method_data:
-            ax3.boxplot(method_data, labels=method_labels)
+            ax3.boxplot(method_data)
+            # Not boxplot(labels=...): renamed to tick_labels in newer matplotlib
+            ax3.set_xticks(range(1, len(method_labels) + 1), method_labels)
             ax3.set_title('Verification Scores by Voting Method')
             ax3.set_ylabel('Verification Score')
         else:
@@ -263,12 +406,11 @@ class VotingResultsVisualizer:
             ax3.set_title('Verification Scores by Voting Method (No Data)')
         
         # Scatter plot: Score vs Time (if timestamps available)
-        df_with_time = df[df['timestamp'] != ''].copy()
+        df_with_time = df[df['datetime'].notna()]
         if not df_with_time.empty:
             try:
-                df_with_time['datetime'] = pd.to_datetime(df_with_time['timestamp'])
                 scatter = ax4.scatter(df_with_time['datetime'], df_with_time['verification_score'],
-                                    c=df_with_time['party'].astype('category').cat.codes, cmap='viridis')
+                                    c=df_with_time['party'].cat.codes, cmap='viridis')
                 ax4.set_title('Verification Scores Over Time')
                 ax4.set_xlabel('Time')
                 ax4.set_ylabel('Verification Score')
@@ -282,24 +424,19 @@ class VotingResultsVisualizer:
                     ha='center', va='center', transform=ax4.transAxes)
             ax4.set_title('Verification Scores Over Time (No Data)')
         
-        plt.tight_layout()
-        plt.savefig('results/verification_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        self.finish(fig, 'verification_analysis')
     
-    def plot_biometric_analysis(self):
+    def plot_biometric_analysis(self, df=None):
         """Analyze biometric verification success rates"""
-        df = self.prepare_combined_data()
+        if df is None:
+            df = self.chart_data()
+            if df is None:
+                return
         
-        if df.empty:
-            print("[WARNING] No voting data available. Creating sample data...")
-            self.create_sample_data()
-            df = self.prepare_combined_data()
-        
-        if df.empty:
-            print("[ERROR] Still no data available")
+        if self.cached('biometric_analysis', df):
             return
         
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
+        fig, ((ax1, ax2), (ax3, ax4)) = self.figure('biometric_analysis', 2, 2, (15, 10))
         
         # Biometric verification success rates
         face_success = df['face_verified'].sum()
@@ -321,16 +458,13 @@ class VotingResultsVisualizer:
         
         # Verification method distribution
         method_counts = df['method'].value_counts()
+        method_counts = method_counts[method_counts > 0]
         ax2.pie(method_counts.values, labels=method_counts.index, autopct='%1.1f%%',
                colors=['lightgreen', 'orange'])
         ax2.set_title('Voting Method Distribution')
         
         # Score ranges analysis
-        score_ranges = pd.cut(df['verification_score'], 
-                             bins=[0, 0.5, 0.7, 0.85, 1.0],
-                             labels=['Low (0-0.5)', 'Medium (0.5-0.7)', 
-                                   'High (0.7-0.85)', 'Very High (0.85-1.0)'])
-        range_counts = score_ranges.value_counts()
+        range_counts = df['score_range'].value_counts()
         
         bars3 = ax3.bar(range_counts.index, range_counts.values, 
                        color=['red', 'orange', 'lightblue', 'green'])
@@ -339,10 +473,8 @@ class VotingResultsVisualizer:
         ax3.tick_params(axis='x', rotation=45)
         
         # Security level analysis
-        df['security_level'] = df['verification_score'].apply(
-            lambda x: 'High' if x >= 0.8 else 'Medium' if x >= 0.6 else 'Low'
-        )
         security_counts = df['security_level'].value_counts()
+        security_counts = security_counts[security_counts > 0]
         
         colors_security = {'High': 'green', 'Medium': 'orange', 'Low': 'red'}
         bars4 = ax4.bar(security_counts.index, security_counts.values,
@@ -350,41 +482,39 @@ class VotingResultsVisualizer:
         ax4.set_title('Security Level Distribution')
         ax4.set_ylabel('Number of Votes')
         
-        plt.tight_layout()
-        plt.savefig('results/biometric_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        self.finish(fig, 'biometric_analysis')
     
-    def plot_time_analysis(self):
+    def plot_time_analysis(self, df=None):
         """Analyze voting patterns over time"""
-        df = self.prepare_combined_data()
-        df_time = df[df['timestamp'] != ''].copy()
+        prepared = df is not None
+        if not prepared:
+            df = self.results_frame()
+        df_time = df[df['datetime'].notna()]
         
-        if df_time.empty:
+        if df_time.empty and not prepared:
             print("[WARNING] No timestamp data available. Creating sample data...")
             self.create_sample_data()
-            df = self.prepare_combined_data()
-            df_time = df[df['timestamp'] != ''].copy()
+            df = self.results_frame()
+            df_time = df[df['datetime'].notna()]
+        
+        if self.cached('time_analysis', df_time):
+            return
         
         if df_time.empty:
             print("[WARNING] Still no timestamp data available")
             # Create a simple time analysis chart with available data
-            fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+            fig, ax = self.figure('time_analysis', 1, 1, (10, 6))
             ax.text(0.5, 0.5, 'No timestamp data available for time analysis\nVotes were recorded but without timestamps', 
                     ha='center', va='center', transform=ax.transAxes, fontsize=14)
             ax.set_title('Time Analysis - No Data Available')
-            plt.savefig('results/time_analysis.png', dpi=300, bbox_inches='tight')
-            plt.show()
+            self.finish(fig, 'time_analysis', tight=False)
             return
         
         try:
-            df_time['datetime'] = pd.to_datetime(df_time['timestamp'])
-            df_time['hour'] = df_time['datetime'].dt.hour
-            df_time['day'] = df_time['datetime'].dt.day
-            
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+            fig, (ax1, ax2) = self.figure('time_analysis', 1, 2, (15, 6))
             
             # Voting by hour
-            hourly_votes = df_time['hour'].value_counts().sort_index()
+            hourly_votes = df_time['datetime'].dt.hour.value_counts().sort_index()
             ax1.plot(hourly_votes.index, hourly_votes.values, marker='o', linewidth=2, markersize=6)
             ax1.set_title('Voting Pattern by Hour of Day')
             ax1.set_xlabel('Hour of Day')
@@ -392,10 +522,9 @@ class VotingResultsVisualizer:
             ax1.grid(True, alpha=0.3)
             
             # Cumulative votes over time
-            df_time_sorted = df_time.sort_values('datetime')
-            df_time_sorted['cumulative_votes'] = range(1, len(df_time_sorted) + 1)
+            vote_times = np.sort(df_time['datetime'].to_numpy())
             
-            ax2.plot(df_time_sorted['datetime'], df_time_sorted['cumulative_votes'], 
+            ax2.plot(vote_times, np.arange(1, len(vote_times) + 1), 
                     linewidth=3, color='green')
             ax2.set_title('Cumulative Votes Over Time')
             ax2.set_xlabel('Time')
@@ -403,31 +532,22 @@ class VotingResultsVisualizer:
             ax2.grid(True, alpha=0.3)
             plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
             
-            plt.tight_layout()
-            plt.savefig('results/time_analysis.png', dpi=300, bbox_inches='tight')
-            plt.show()
+            self.finish(fig, 'time_analysis')
             
         except Exception as e:
             print(f"[ERROR] Error in time analysis: {e}")
-            fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+            fig, ax = self.figure('time_analysis', 1, 1, (10, 6))
             ax.text(0.5, 0.5, f'Error processing timestamp data: {e}', 
                     ha='center', va='center', transform=ax.transAxes)
             ax.set_title('Time Analysis - Error')
-            plt.savefig('results/time_analysis.png', dpi=300, bbox_inches='tight')
-            plt.show()
+            self.finish(fig, 'time_analysis', tight=False)
     
-    def generate_comprehensive_report(self):
+    def generate_comprehensive_report(self, df=None):
         """Generate a comprehensive statistical report"""
-        df = self.prepare_combined_data()
-        
-        if df.empty:
-            print("[WARNING] No voting data available. Creating sample data...")
-            self.create_sample_data()
-            df = self.prepare_combined_data()
-        
-        if df.empty:
-            print("[WARNING] No voting data available for report")
-            return
+        if df is None:
+            df = self.chart_data()
+            if df is None:
+                return
         
         print("\n" + "="*60)
         print("📊 COMPREHENSIVE BIOMETRIC VOTING SYSTEM REPORT")
@@ -447,15 +567,16 @@ class VotingResultsVisualizer:
         
         # Party-wise results
         print(f"\n🗳️ PARTY-WISE RESULTS:")
-        vote_counts = df['party'].value_counts()
+        vote_counts = self.party_counts(df)
         for party, count in vote_counts.items():
             percentage = (count/total_votes)*100
             print(f"   {party}: {count} votes ({percentage:.1f}%)")
         
         # Security Analysis
-        high_security = len(df[df['verification_score'] >= 0.8])
-        medium_security = len(df[(df['verification_score'] >= 0.6) & (df['verification_score'] < 0.8)])
-        low_security = len(df[df['verification_score'] < 0.6])
+        security_counts = df['security_level'].value_counts()
+        high_security = security_counts['High']
+        medium_security = security_counts['Medium']
+        low_security = security_counts['Low']
         
         print(f"\n🔐 SECURITY ANALYSIS:")
         print(f"   High Security (≥0.8): {high_security} votes ({high_security/total_votes*100:.1f}%)")
@@ -473,6 +594,7 @@ class VotingResultsVisualizer:
         
         # Method Analysis
         method_counts = df['method'].value_counts()
+        method_counts = method_counts[method_counts > 0]
         print(f"\n💻 VOTING METHOD ANALYSIS:")
         for method, count in method_counts.items():
             percentage = (count/total_votes)*100
@@ -480,45 +602,93 @@ class VotingResultsVisualizer:
         
         print("\n" + "="*60)
     
-    def create_all_visualizations(self):
-        """Create all visualizations and save them"""
+    def create_all_visualizations(self, progress=None, pool=None, profiles=None):
+        """Create all visualizations and save them; returns ({chart file: seconds},
+        {chart file: error message}) with an entry in the latter per failed chart.
+
+        The votes are prepared once and every chart is drawn from that frame,
+        in each of the given render profiles (default: this visualizer's).
+        Given a process pool the charts are drawn concurrently in it, so the
+        whole run takes about as long as the slowest chart. progress(fraction,
+        message) is called as each step finishes when given.
+        """
         # Create results directory
         os.makedirs('results', exist_ok=True)
         
         print("🎨 Generating all visualizations...")
+        df = self.chart_data()
+        if df is None:
+            return {}, {}
+        
+        profiles = profiles or [self.profile]
+        charts = [(name, profile) for profile in profiles for name in self.plotters]
+        timings = {}
+        errors = {}
+        steps = len(charts) + 1
+        
+        def finished(name, seconds, error=None):
+            timings[name] = seconds
+            if error is None:
+                print(f"✅ {name} completed")
+            else:
+                errors[name] = str(error)
+                print(f"❌ Error in {name}: {error}")
+            if progress:
+                progress(len(timings) / steps, f"{name} completed")
         
-        try:
-            self.plot_vote_distribution()
-            print("✅ Vote distribution completed")
-        except Exception as e:
-            print(f"❌ Error in vote distribution: {e}")
-        
-        try:
-            self.plot_verification_scores()
-            print("✅ Verification scores completed")
-        except Exception as e:
-            print(f"❌ Error in verification scores: {e}")
+        def run(step):
+            started = time.perf_counter()
+            try:
+                step(df)
+            except Exception as e:
+                return time.perf_counter() - started, e
+            return time.perf_counter() - started, None
         
-        try:
-            self.plot_biometric_analysis()
-            print("✅ Biometric analysis completed")
-        except Exception as e:
-            print(f"❌ Error in biometric analysis: {e}")
+        futures = {}
+        if pool is not None:
+            futures = {pool.submit(render_chart, name, df, profile): os.path.basename(chart_path(name, profile))
+                       for name, profile in charts}
+        else:
+            current = self.profile
+            try:
+                for name, profile in charts:
+                    self.profile = profile
+                    finished(os.path.basename(chart_path(name, profile)), *run(self.plotters[name]))
+            finally:
+                self.profile = current
         
-        try:
-            self.plot_time_analysis()
-            print("✅ Time analysis completed")
-        except Exception as e:
-            print(f"❌ Error in time analysis: {e}")
+        # Text only, so it runs here while the pool draws
+        finished('report', *run(self.generate_comprehensive_report))
         
-        try:
-            self.generate_comprehensive_report()
-            print("✅ Comprehensive report completed")
-        except Exception as e:
-            print(f"❌ Error in comprehensive report: {e}")
+        for future in as_completed(futures):
+            try:
+                finished(futures[future], future.result())
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                finished(futures[future], None, e)
         
-        print("\n✅ All visualizations completed!")
+        if errors:
+            print(f"\n⚠️ Visualizations completed with {len(errors)} error(s)")
+        else:
+            print("\n✅ All visualizations completed!")
         print("📁 Charts saved in 'results/' folder")
+        return timings, errors
+
+
+_chart_worker = None
+
+
+def render_chart(name, df, profile=DEFAULT_PROFILE):
+    """Process pool task: draw one chart headlessly from a prepared frame; returns seconds"""
+    global _chart_worker
+    if _chart_worker is None:
+        plt.switch_backend('Agg')
+        _chart_worker = VotingResultsVisualizer(interactive=False, load=False)
+    _chart_worker.profile = profile
+    started = time.perf_counter()
+    _chart_worker.plotters[name](df)
+    return time.perf_counter() - started
 
 def main():
     try:
@@ -0,0 +1,147 @@
+import os
+import threading
+from array import array
+
+import numpy as np
+
+from ballot import get_ballot
+from vote_log import CLI_VOTES_FILE, GUI_VOTES_FILE, open_log
+
+# Vote file -> method label
+SOURCES = {
+    CLI_VOTES_FILE: "CLI",
+    GUI_VOTES_FILE: "GUI",
+}
+
+
+def file_signature(path):
+    """(inode, size, mtime) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class SourceTally:
+    """Running counters for one vote file (snapshot + append-only log).
+
+    Appends to the log are folded in by reading only the bytes past the last
+    offset. Anything else - a compaction replacing the snapshot, the log
+    shrinking, a file being cleared - triggers a full rebuild.
+    """
+
+    def __init__(self, snapshot_path, method):
+        self.log = open_log(snapshot_path)
+        self.method = method
+        self.ballot = get_ballot()
+        self.snapshot_signature = None
+        self.log_inode = None
+        self.log_size = 0
+        self.reset()
+
+    def reset(self):
+        self.voters = set()
+        # One candidate code per counted vote; party totals are a bincount
+        self.codes = array('H')
+        self.total = 0
+        self.score_sum = 0.0
+        self.offset = 0
+
+    def add(self, voter, record):
+        # First record per voter wins, matching VoteLog replay
+        if voter in self.voters or not isinstance(record, dict):
+            return
+        self.voters.add(voter)
+        self.codes.append(self.ballot.record_code(record))
+        self.total += 1
+        if 'verification_score' in record:
+            self.score_sum += record['verification_score']
+
+    def rebuild(self):
+        self.reset()
+        snapshot, entries, offset = self.log.load_with_offset()
+        for voter, record in snapshot.items():
+            self.add(voter, record)
+        for voter, record in entries:
+            self.add(voter, record)
+        self.offset = offset
+
+    def refresh(self):
+        """Bring the counters up to date; returns True if anything changed"""
+        snapshot_signature = file_signature(self.log.snapshot_path)
+        log_signature = file_signature(self.log.log_path)
+        log_inode, log_size = (log_signature[0], log_signature[1]) if log_signature else (None, 0)
+
+        if snapshot_signature != self.snapshot_signature or log_inode != self.log_inode \
+                or log_size < self.log_size:
+            self.snapshot_signature = snapshot_signature
+            self.log_inode, self.log_size = log_inode, log_size
+            self.rebuild()
+            return True
+        if log_size == self.log_size:
+            return False
+
+        self.log_size = log_size
+        entries, self.offset = self.log.read_log(self.offset)
+        for voter, record in entries:
+            self.add(voter, record)
+        return True
+
+
+class TallyEngine:
+    """In-process live tally over every vote source.
+
+    `stats()` and `has_voted()` cost a few stat() calls when nothing has
+    changed and only parse newly appended log lines when something has.
+    `version` is bumped on every change, so callers can cheaply tell whether
+    results moved.
+    """
+
+    def __init__(self, sources=SOURCES):
+        self.sources = [SourceTally(path, method) for path, method in sources.items()]
+        self.lock = threading.Lock()
+        self.version = 0
+        self.cached = None
+
+    def refresh(self):
+        with self.lock:
+            changed = False
+            for source in self.sources:
+                changed = source.refresh() or changed
+            if changed or self.cached is None:
+                self.version += 1
+                self.cached = self._build_stats()
+            return self.version
+
+    def _build_stats(self):
+        stats = {
+            'total_votes': 0,
+            'parties': {},
+            'avg_score': 0,
+            'methods': {}
+        }
+        score_sum = 0.0
+        ballot = get_ballot()
+        counts = np.zeros(ballot.size, dtype=np.int64)
+        for source in self.sources:
+            if source.total:
+                counts += ballot.bincount(np.frombuffer(source.codes, dtype=np.uint16))
+                stats['methods'][source.method] = source.total
+            stats['total_votes'] += source.total
+            score_sum += source.score_sum
+        stats['parties'] = ballot.as_parties(counts)
+        if stats['total_votes'] > 0:
+            stats['avg_score'] = score_sum / stats['total_votes']
+        return stats
+
+    def has_voted(self, voter):
+        """O(1) check against the voter sets kept in step with the vote logs"""
+        self.refresh()
+        return any(voter in source.voters for source in self.sources)
+
+    def stats(self):
+        """Current stats dict (shape matches the old get_voting_stats)"""
+        self.refresh()
+        stats = self.cached
+        return dict(stats, parties=dict(stats['parties']), methods=dict(stats['methods']))
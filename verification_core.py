@@ -0,0 +1,374 @@
+import glob
+import os
+
+import cv2
+import numpy as np
+from scipy.spatial.distance import euclidean
+
+import iris_codes
+from iris_features import extract_iris_features, to_gray
+
+MAX_FRAMES = 200
+
+# Face match thresholds: "l2" is the distance between normalized embeddings
+# (kiosk GUI), "cosine" is 1 - cosine similarity (CLI)
+FACE_THRESHOLDS = {"l2": 1.2, "cosine": 0.6}
+IRIS_THRESHOLD = 1000
+IRIS_MAX_DISTANCE = 2000
+
+# Score-level fusion weights and acceptance threshold
+FACE_WEIGHT = 0.6
+IRIS_WEIGHT = 0.4
+COMBINED_THRESHOLD = 0.65
+
+# Eye ROI geometry, as fractions of the distance between the two eye keypoints.
+# The iris radius is roughly 0.09x the inter-eye distance; the lower bound
+# keeps Hough from locking onto the pupil
+EYE_ROI_HALF_SIZE = 0.35
+IRIS_MIN_RADIUS = 0.07
+IRIS_MAX_RADIUS = 0.16
+
+
+def detect_iris(image):
+    """Detect iris in a BGR or grayscale image"""
+    gray = to_gray(image)
+    gray = cv2.medianBlur(gray, 5)
+    gray = cv2.equalizeHist(gray)
+
+    circles = cv2.HoughCircles(
+        gray, cv2.HOUGH_GRADIENT, dp=1, minDist=30,
+        param1=50, param2=30, minRadius=15, maxRadius=100
+    )
+
+    if circles is not None:
+        circles = np.round(circles[0, :]).astype("int")
+        if len(circles) > 0:
+            # Return the most prominent circle (largest radius)
+            return max(circles, key=lambda c: c[2])
+    return None
+
+
+def eye_regions(face, frame_shape):
+    """Square crop boxes (x0, y0, x1, y1) around both eye keypoints of a face"""
+    kps = np.asarray(face.kps)
+    eye_distance = float(np.linalg.norm(kps[1] - kps[0]))
+    half = max(12, int(eye_distance * EYE_ROI_HALF_SIZE))
+    height, width = frame_shape[:2]
+    boxes = []
+    for ex, ey in kps[:2]:
+        x0, y0 = max(0, int(ex) - half), max(0, int(ey) - half)
+        x1, y1 = min(width, int(ex) + half), min(height, int(ey) + half)
+        if x1 - x0 > 4 and y1 - y0 > 4:
+            boxes.append((x0, y0, x1, y1))
+    return boxes, eye_distance
+
+
+def detect_iris_in_eyes(image, face):
+    """Detect the iris inside small crops around a face's eye keypoints.
+
+    Runs Hough only on the two eye regions with a radius range scaled to the
+    inter-eye distance, and picks the circle closest to an eye centre, which
+    rules out buttons and face outlines elsewhere in the frame.
+    """
+    gray = to_gray(image)
+    boxes, eye_distance = eye_regions(face, gray.shape)
+    min_radius = max(3, int(eye_distance * IRIS_MIN_RADIUS))
+    max_radius = max(min_radius + 2, int(eye_distance * IRIS_MAX_RADIUS))
+
+    best, best_offset = None, None
+    for (x0, y0, x1, y1), (ex, ey) in zip(boxes, np.asarray(face.kps)[:2]):
+        roi = cv2.medianBlur(gray[y0:y1, x0:x1], 5)
+        roi = cv2.equalizeHist(roi)
+        circles = cv2.HoughCircles(
+            roi, cv2.HOUGH_GRADIENT, dp=1, minDist=roi.shape[1],
+            param1=50, param2=15, minRadius=min_radius, maxRadius=max_radius
+        )
+        if circles is None:
+            continue
+        for cx, cy, r in np.round(circles[0, :]).astype("int"):
+            x, y = cx + x0, cy + y0
+            offset = float(np.hypot(x - ex, y - ey))
+            if best is None or offset < best_offset:
+                best, best_offset = np.array([x, y, r]), offset
+    return best
+
+
+def largest_face(faces):
+    if not faces:
+        return None
+    return max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+
+
+def locate_iris(image, faces, full_frame_fallback=False):
+    """Iris circle from the eyes of the largest detected face.
+
+    Without a face the frame is skipped unless `full_frame_fallback` is set,
+    in which case the legacy full-frame detector is used.
+    """
+    face = largest_face(faces)
+    if face is not None and getattr(face, "kps", None) is not None:
+        return detect_iris_in_eyes(image, face)
+    if full_frame_fallback:
+        return detect_iris(image)
+    return None
+
+
+def camera_frames(limit=MAX_FRAMES, camera=0):
+    """Yield frames from a camera until `limit` frames have been read"""
+    cap = cv2.VideoCapture(camera)
+    try:
+        read = 0
+        while read < limit:
+            ret, frame = cap.read()
+            if not ret:
+                if not cap.isOpened():
+                    break
+                continue
+            read += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def video_frames(path, limit=None):
+    """Yield frames from a video file"""
+    cap = cv2.VideoCapture(path)
+    try:
+        read = 0
+        while limit is None or read < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            read += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def image_frames(paths):
+    """Yield frames from image files; a directory yields its images in name order"""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(f for f in glob.glob(os.path.join(path, "*"))
+                           if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")))
+        else:
+            files = [path]
+        for file in files:
+            frame = cv2.imread(file)
+            if frame is None:
+                print(f"[WARNING] Could not read image {file}")
+                continue
+            yield frame
+
+
+def frames_from_source(source, limit=MAX_FRAMES):
+    """Camera index, video file, image file or image directory -> frame iterator"""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return camera_frames(limit, int(source))
+    if isinstance(source, str) and source.lower().endswith((".mp4", ".avi", ".mov", ".mkv")):
+        return video_frames(source, limit)
+    return image_frames(source)
+
+
+class MultimodalVerifier:
+    """Display-free face + iris verification over any iterator of frames.
+
+    `process_frame` scores a single frame and `verify` runs the attempt loop,
+    returning the per-frame scores and the fused decision. Drawing and
+    windowing are left to the caller through the `on_frame` callback.
+    """
+
+    def __init__(self, face_model, face_index=None, user_name=None, registered_iris=None,
+                 use_face=True, use_iris=True, face_metric="l2", max_frames=MAX_FRAMES,
+                 full_frame_iris=False, registered_iris_code=None):
+        self.face_model = face_model
+        self.face_index = face_index
+        self.user_name = user_name
+        self.registered_iris = registered_iris
+        # Binary iris codes take precedence; voters enrolled before they
+        # existed fall back to the statistical template
+        self.registered_iris_code = registered_iris_code
+        self.use_iris = use_iris and (registered_iris is not None or registered_iris_code is not None)
+        self.use_face = use_face and face_index is not None and user_name in face_index
+        self.iris_threshold = (iris_codes.HAMMING_THRESHOLD if registered_iris_code is not None
+                               else IRIS_THRESHOLD)
+        self.face_metric = face_metric
+        self.face_threshold = FACE_THRESHOLDS[face_metric]
+        self.max_frames = max_frames
+        self.full_frame_iris = full_frame_iris
+        self.registered_row = face_index.rows.get(user_name) if face_index is not None else None
+
+    def score_face(self, face):
+        """Return (distance, confidence) of a detected face against the claimed voter"""
+        embedding = face.normed_embedding if self.face_metric == "l2" else face.embedding
+        # Score against every enrolled voter in one pass; reject faces where
+        # someone else on the roll is a closer match
+        scores = self.face_index.scores(embedding)
+        similarity = float(scores[self.registered_row])
+        if scores[int(np.argmax(scores))] > similarity:
+            return float("inf"), 0.0
+        if self.face_metric == "l2":
+            distance = float(np.sqrt(max(0.0, 2 - 2 * similarity)))
+            return distance, float(max(0, 1 - distance))
+        return 1 - similarity, similarity
+
+    def score_iris(self, frame, faces):
+        """Return (circle, distance, confidence) for the iris found in a frame"""
+        # Convert once and share the grayscale frame between detection and extraction
+        gray = to_gray(frame)
+        circle = locate_iris(gray, faces, self.full_frame_iris)
+        if circle is None:
+            return None, None, None
+        if self.registered_iris_code is not None:
+            template = iris_codes.make_template(gray, circle)
+            if template is None:
+                return circle, None, None
+            distance = iris_codes.hamming_distance(template, self.registered_iris_code)
+            return circle, distance, iris_codes.confidence(distance)
+
+        features = extract_iris_features(gray, circle)
+        if features is None or len(features) != len(self.registered_iris):
+            return circle, None, None
+        distance = float(euclidean(self.registered_iris, features))
+        confidence = float(max(0, 1 - (distance / IRIS_MAX_DISTANCE)))
+        return circle, distance, confidence
+
+    def process_frame(self, frame):
+        """Score one frame; returns a dict of per-frame results"""
+        result = {
+            "faces": [],
+            "face_distance": None,
+            "face_confidence": None,
+            "face_verified": False,
+            "iris_circle": None,
+            "iris_distance": None,
+            "iris_confidence": None,
+            "iris_verified": False,
+        }
+
+        # One detection pass per frame serves both face matching and the
+        # eye keypoints used to place the iris search
+        faces = self.face_model.get(frame) if (self.use_face or self.use_iris) else []
+        iris_faces = faces
+
+        if self.use_face:
+            for face in faces:
+                distance, confidence = self.score_face(face)
+                matched = distance < self.face_threshold
+                result["faces"].append((face.bbox.astype(int), confidence, matched))
+                result["face_distance"] = distance
+                result["face_confidence"] = confidence
+                if matched:
+                    result["face_verified"] = True
+                    iris_faces = [face]
+                    break
+
+        if self.use_iris:
+            circle, distance, confidence = self.score_iris(frame, iris_faces)
+            result["iris_circle"] = circle
+            result["iris_distance"] = distance
+            result["iris_confidence"] = confidence
+            result["iris_verified"] = distance is not None and distance < self.iris_threshold
+
+        return result
+
+    def verify(self, frames, on_frame=None):
+        """Run verification over frames until every modality passes.
+
+        `on_frame(frame, frame_result, state)` is called after each frame
+        (e.g. to draw an overlay); returning False stops the loop early.
+        """
+        state = {
+            "face_verified": False,
+            "iris_verified": False,
+            "face_confidence": 0.0,
+            "iris_confidence": 0.0,
+        }
+        per_frame = []
+
+        for frame in frames:
+            if len(per_frame) >= self.max_frames:
+                break
+            frame_result = self.process_frame(frame)
+            per_frame.append({
+                "face_confidence": frame_result["face_confidence"],
+                "iris_confidence": frame_result["iris_confidence"],
+                "face_verified": frame_result["face_verified"],
+                "iris_verified": frame_result["iris_verified"],
+            })
+
+            if frame_result["face_confidence"] is not None:
+                state["face_confidence"] = frame_result["face_confidence"]
+            if frame_result["iris_confidence"] is not None:
+                state["iris_confidence"] = frame_result["iris_confidence"]
+            state["face_verified"] = state["face_verified"] or frame_result["face_verified"]
+            state["iris_verified"] = state["iris_verified"] or frame_result["iris_verified"]
+
+            if on_frame is not None and on_frame(frame, frame_result, state) is False:
+                break
+            if ((state["face_verified"] or not self.use_face)
+                    and (state["iris_verified"] or not self.use_iris)):
+                break
+
+        combined_score = float((state["face_confidence"] * FACE_WEIGHT) +
+                               (state["iris_confidence"] * IRIS_WEIGHT))
+        verified = (state["face_verified"] and state["iris_verified"]) or (combined_score > COMBINED_THRESHOLD)
+        return dict(state, combined_score=combined_score, verified=verified,
+                    frames_processed=len(per_frame), frames=per_frame)
+
+
+def draw_overlay(frame, frame_result, state):
+    """Draw face boxes, the iris circle and a status line onto a copy of the frame"""
+    display_frame = frame.copy()
+    for bbox, confidence, matched in frame_result["faces"]:
+        color = (0, 255, 0) if matched else (0, 0, 255)
+        cv2.rectangle(display_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
+        cv2.putText(display_frame, f"Face: {confidence:.2f}",
+                    (bbox[0], bbox[1]-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    if frame_result["iris_circle"] is not None:
+        x, y, r = frame_result["iris_circle"]
+        color = (255, 0, 0) if frame_result["iris_verified"] else (0, 0, 255)
+        cv2.circle(display_frame, (x, y), r, color, 2)
+        cv2.circle(display_frame, (x, y), 2, color, 3)
+        if frame_result["iris_confidence"] is not None:
+            cv2.putText(display_frame, f"Iris: {frame_result['iris_confidence']:.2f}",
+                        (x-50, y-r-20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    status = f"Face: {'✓' if state['face_verified'] else '✗'} | Iris: {'✓' if state['iris_verified'] else '✗'}"
+    cv2.putText(display_frame, status, (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+    return display_frame
+
+
+def window_callback(title):
+    """on_frame callback that shows the overlay in an OpenCV window; 'q' stops"""
+    def on_frame(frame, frame_result, state):
+        cv2.imshow(title, draw_overlay(frame, frame_result, state))
+        return cv2.waitKey(1) != ord('q')
+    return on_frame
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    import insightface
+    from embedding_store import open_store
+    from face_index import FaceIndex
+
+    if len(sys.argv) < 3:
+        print("Usage: python verification_core.py <name> <camera index | video | image | image dir>")
+        sys.exit(1)
+
+    face_model = insightface.app.FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
+    face_model.prepare(ctx_id=0)
+    store = open_store()
+    user_name = sys.argv[1].lower().strip()
+    verifier = MultimodalVerifier(face_model, FaceIndex.from_store(store), user_name,
+                                  store.get("iris", user_name),
+                                  registered_iris_code=store.get("iris_code", user_name))
+    result = verifier.verify(frames_from_source(sys.argv[2]))
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows kiosks fall back to the in-process lock only
+    fcntl = None
+
+CLI_VOTES_FILE = "data/votes.json"
+GUI_VOTES_FILE = "voted_users.json"
+
+# "always" fsyncs every vote, "interval" at most once per FSYNC_INTERVAL
+# seconds, "never" leaves flushing to the OS
+FSYNC_POLICY = os.environ.get("VOTE_LOG_FSYNC", "always")
+FSYNC_INTERVAL = float(os.environ.get("VOTE_LOG_FSYNC_INTERVAL", "1.0"))
+# Fold the log into the snapshot after this many appends from one process
+COMPACT_EVERY = int(os.environ.get("VOTE_LOG_COMPACT_EVERY", "500"))
+
+
+def log_path_for(snapshot_path):
+    """data/votes.json -> data/votes.log.jsonl"""
+    return os.path.splitext(snapshot_path)[0] + ".log.jsonl"
+
+
+class VoteLog:
+    """Append-only, line-delimited vote log in front of a JSON snapshot.
+
+    The snapshot is the original ``{voter: record}`` JSON file and is only
+    ever replaced atomically during compaction. Every vote is one JSON line
+    ``{"voter": ..., "record": ...}`` appended to ``<snapshot>.log.jsonl``,
+    so recording a vote costs O(1) I/O and a crash can at worst leave a
+    torn last line, which replay skips.
+
+    The current state is the snapshot with the log replayed on top. A voter
+    only ever keeps their first record, which also makes replay idempotent
+    if a crash happens between writing a snapshot and truncating the log.
+    """
+
+    def __init__(self, snapshot_path, fsync=FSYNC_POLICY, compact_every=COMPACT_EVERY):
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path_for(snapshot_path)
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.appended = 0
+        self.last_fsync = 0.0
+        os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path, "r") as f:
+                content = f.read().strip()
+            return json.loads(content) if content else {}
+        except json.JSONDecodeError as e:
+            print(f"[WARNING] Error reading {self.snapshot_path}: {e}. Starting from an empty snapshot")
+            return {}
+
+    def read_log(self, offset=0):
+        """Parse complete log lines from `offset`; returns ([(voter, record)], next_offset)"""
+        if not os.path.exists(self.log_path):
+            return [], 0
+        entries = []
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                entries.append((entry["voter"], entry["record"]))
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                print(f"[WARNING] Skipping corrupt line in {self.log_path}: {e}")
+        # A torn tail without its newline is left for a later read
+        return entries, offset + end
+
+    def load(self):
+        """Snapshot plus replayed log tail as one {voter: record} dict"""
+        votes, entries, _ = self.load_with_offset()
+        for voter, record in entries:
+            votes.setdefault(voter, record)
+        return votes
+
+    def load_with_offset(self):
+        """(snapshot, log entries, log offset) read consistently with compaction"""
+        if fcntl is None or not os.path.exists(self.log_path):
+            entries, offset = self.read_log()
+            return self.load_snapshot(), entries, offset
+        with open(self.log_path, "rb") as lock_file:
+            # Shared lock so a compaction cannot swap the snapshot between the two reads
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            entries, offset = self.read_log()
+            return self.load_snapshot(), entries, offset
+
+    def _sync(self, fd):
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self.last_fsync >= FSYNC_INTERVAL):
+            os.fsync(fd)
+            self.last_fsync = now
+
+    def append(self, voter, record):
+        """Durably record one vote (subject to the fsync policy)"""
+        self.append_many([(voter, record)])
+
+    def append_many(self, entries):
+        """Record a batch of (voter, record) pairs with one write and one fsync"""
+        if not entries:
+            return
+        line = b"".join((json.dumps({"voter": voter, "record": record}) + "\n").encode("utf-8")
+                        for voter, record in entries)
+        with self.lock:
+            fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    # Shared: appends from other processes may proceed, compaction may not
+                    fcntl.flock(fd, fcntl.LOCK_SH)
+                # Close off a torn line left by a crashed writer so this
+                # record is not glued onto it
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    line = b"\n" + line
+                os.write(fd, line)
+                self._sync(fd)
+            finally:
+                os.close(fd)
+            self.appended += len(entries)
+            if self.compact_every and self.appended >= self.compact_every:
+                self._compact()
+
+    def compact(self):
+        """Fold the log into a new snapshot and truncate the log"""
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            votes = self.load_snapshot()
+            for voter, record in self.read_log()[0]:
+                votes.setdefault(voter, record)
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(votes, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._sync_directory()
+            # A crash before this point only leaves records that replay dedupes
+            os.ftruncate(fd, 0)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.appended = 0
+        print(f"[INFO] Compacted {self.log_path} into {self.snapshot_path} ({len(votes)} votes)")
+        return len(votes)
+
+    def _sync_directory(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def clear(self):
+        """Remove every recorded vote (snapshot and log)"""
+        with self.lock:
+            with open(self.snapshot_path, "w") as f:
+                json.dump({}, f)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.appended = 0
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def open_log(snapshot_path):
+    """Shared VoteLog per snapshot file, so compaction counts are per process"""
+    with _logs_lock:
+        if snapshot_path not in _logs:
+            _logs[snapshot_path] = VoteLog(snapshot_path)
+        return _logs[snapshot_path]
+
+
+def load_votes(snapshot_path):
+    return open_log(snapshot_path).load()
+
+
+if __name__ == "__main__":
+    # python vote_log.py [--compact] -> summarize (and optionally compact) both logs
+    for path in (CLI_VOTES_FILE, GUI_VOTES_FILE):
+        log = open_log(path)
+        entries, _ = log.read_log()
+        print(f"[INFO] {path}: {len(log.load())} votes, {len(entries)} records in {log.log_path}")
+        if "--compact" in sys.argv[1:]:
+            log.compact()
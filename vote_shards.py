@@ -0,0 +1,246 @@
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from ballot import get_ballot
+from election_db import ELECTION_STORE
+from vote_log import VoteLog, open_log
+
+SHARDS_DIR = os.environ.get("VOTE_SHARDS_DIR", "data/shards")
+BOOTH_ID = os.environ.get("BOOTH_ID", socket.gethostname())
+# Each booth starts a new shard file every window
+SHARD_WINDOW_MINUTES = int(os.environ.get("VOTE_SHARD_WINDOW_MINUTES", "60"))
+# Worker processes for the map step (None = one per CPU)
+TALLY_WORKERS = int(os.environ["VOTE_TALLY_WORKERS"]) if os.environ.get("VOTE_TALLY_WORKERS") else None
+# Below this many shards a process pool costs more than it saves
+SERIAL_SHARDS = 8
+
+
+def shards_enabled():
+    return ELECTION_STORE == "shards"
+
+
+def window_of(timestamp=None):
+    """Shard window name (YYYYMMDDTHHMM, floored to the window) for an ISO timestamp"""
+    try:
+        moment = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+    except (TypeError, ValueError):
+        moment = datetime.now()
+    minute = (moment.hour * 60 + moment.minute) // SHARD_WINDOW_MINUTES * SHARD_WINDOW_MINUTES
+    return f"{moment:%Y%m%d}T{minute // 60:02d}{minute % 60:02d}"
+
+
+def booth_dir(booth, root=SHARDS_DIR):
+    if not booth or os.sep in booth or booth.startswith("."):
+        raise ValueError(f"Invalid booth id: {booth!r}")
+    return os.path.join(root, booth)
+
+
+def shard_path(booth, window, root=SHARDS_DIR):
+    """Snapshot path of one shard; its votes are appended to the matching .log.jsonl"""
+    return os.path.join(booth_dir(booth, root), f"{window}.json")
+
+
+def find_shards(root=SHARDS_DIR, booths="*"):
+    """Snapshot paths of every shard under booths matching a glob pattern.
+
+    Booth ids are conventionally "<district>-<booth>", so "mysuru-*" selects
+    one district.
+    """
+    paths = set(glob.glob(os.path.join(root, booths, "*.json")))
+    for log_path in glob.glob(os.path.join(root, booths, "*.log.jsonl")):
+        # Shards that have not been compacted yet only have a log
+        paths.add(log_path[:-len(".log.jsonl")] + ".json")
+    return sorted(paths)
+
+
+class BoothShards:
+    """Vote shards written by one booth: <root>/<booth>/<window>.log.jsonl.
+
+    Only the booth's vote writer appends here, so the set of voters who have
+    voted at this booth is loaded once and kept in memory. Votes cast at
+    other booths are only seen when shards are tallied together, which is
+    where cross-booth duplicates are reported.
+    """
+
+    def __init__(self, booth=BOOTH_ID, root=SHARDS_DIR):
+        self.booth = booth
+        self.root = root
+        os.makedirs(booth_dir(booth, root), exist_ok=True)
+        self.voters = set()
+        for path in find_shards(root, booth):
+            self.voters.update(open_log(path).load())
+
+    def has_voted(self, voter):
+        return voter in self.voters
+
+    def append_many(self, entries):
+        """Append (voter, record) pairs to the shard of each vote's time window"""
+        by_shard = {}
+        for voter, record in entries:
+            path = shard_path(self.booth, window_of(record.get("timestamp")), self.root)
+            by_shard.setdefault(path, []).append((voter, record))
+        for path, shard_entries in by_shard.items():
+            open_log(path).append_many(shard_entries)
+        self.voters.update(voter for voter, _ in entries)
+
+
+def tally_shard(path):
+    """Map step: partial counters for one shard plus its voters for the duplicate check"""
+    ballot = get_ballot()
+    booth = os.path.basename(os.path.dirname(path))
+    window = os.path.basename(path)[:-len(".json")]
+    partial = {"booth": booth, "total_votes": 0, "methods": {}, "score_sum": 0.0, "voters": {}}
+    codes = []
+    for voter, record in VoteLog(path).load().items():
+        if not isinstance(record, dict):
+            continue
+        code = ballot.record_code(record)
+        method = record.get("method", "Unknown")
+        score = record.get("verification_score") or 0
+        codes.append(code)
+        partial["methods"][method] = partial["methods"].get(method, 0) + 1
+        partial["score_sum"] += score
+        partial["voters"][voter] = (record.get("timestamp") or "", booth, window, code, method, score)
+    partial["total_votes"] = len(codes)
+    # Votes per candidate code, summed element-wise in the reduce
+    partial["counts"] = ballot.bincount(codes)
+    return partial
+
+
+def add_count(counts, key, delta):
+    counts[key] = counts.get(key, 0) + delta
+    if not counts[key]:
+        del counts[key]
+
+
+def reduce_partials(partials):
+    """Reduce step: sum the shard counters and settle cross-booth duplicates.
+
+    A voter found in more than one shard keeps only their earliest vote; the
+    later ones are subtracted from the totals and reported.
+    """
+    ballot = get_ballot()
+    stats = {"total_votes": 0, "parties": {}, "methods": {}, "booths": {}, "avg_score": 0,
+             "shards": 0, "duplicates": {}}
+    counts = np.zeros(ballot.size, dtype=np.int64)
+    score_sum = 0.0
+    first_seen = {}
+    repeats = {}
+    for partial in partials:
+        stats["shards"] += 1
+        stats["total_votes"] += partial["total_votes"]
+        score_sum += partial["score_sum"]
+        counts += partial["counts"]
+        for method, count in partial["methods"].items():
+            add_count(stats["methods"], method, count)
+        if partial["total_votes"]:
+            add_count(stats["booths"], partial["booth"], partial["total_votes"])
+
+        voters = partial["voters"]
+        # Set intersection keeps the per-voter Python work to the duplicates
+        for voter in first_seen.keys() & voters.keys():
+            repeats.setdefault(voter, [first_seen[voter]]).append(voters[voter])
+        first_seen.update(voters)
+
+    for voter, entries in repeats.items():
+        entries.sort()
+        for timestamp, booth, window, code, method, score in entries[1:]:
+            stats["total_votes"] -= 1
+            score_sum -= score
+            counts[code] -= 1
+            add_count(stats["methods"], method, -1)
+            add_count(stats["booths"], booth, -1)
+        stats["duplicates"][voter] = [{"booth": booth, "window": window, "timestamp": timestamp}
+                                      for timestamp, booth, window, *_ in entries]
+
+    stats["parties"] = ballot.as_parties(counts)
+    if stats["total_votes"] > 0:
+        stats["avg_score"] = score_sum / stats["total_votes"]
+    return stats
+
+
+def tally_shards(root=SHARDS_DIR, booths="*", workers=TALLY_WORKERS):
+    """Map-reduce tally over every shard of the matching booths"""
+    paths = find_shards(root, booths)
+    if len(paths) < SERIAL_SHARDS or workers == 1:
+        return reduce_partials(map(tally_shard, paths))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        return reduce_partials(pool.map(tally_shard, paths, chunksize=chunksize))
+
+
+def shard_stamp(path):
+    """(mtime, size) of a shard's snapshot and log; changes whenever a vote is appended"""
+    stamp = []
+    for file_path in (path, path[:-len(".json")] + ".log.jsonl"):
+        try:
+            stat = os.stat(file_path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class ShardTally:
+    """Live totals and has-voted over every booth's shards, for the web app.
+
+    Keeps each shard's partial tally and only re-tallies the shards whose
+    files changed since the last refresh, so polling it between votes costs
+    a stat() per shard. The version counter moves whenever any shard does.
+    """
+
+    def __init__(self, root=SHARDS_DIR, booths="*"):
+        self.root = root
+        self.booths = booths
+        self.lock = threading.Lock()
+        self.partials = {}
+        self.stamps = None
+        self.version = 0
+        self.cached = reduce_partials([])
+
+    def refresh(self):
+        """Re-tally changed shards; returns the version"""
+        with self.lock:
+            stamps = {path: shard_stamp(path) for path in find_shards(self.root, self.booths)}
+            if stamps == self.stamps:
+                return self.version
+            for path, stamp in stamps.items():
+                cached = self.partials.get(path)
+                if cached is None or cached[0] != stamp:
+                    self.partials[path] = (stamp, tally_shard(path))
+            for path in set(self.partials) - set(stamps):
+                del self.partials[path]
+            self.stamps = stamps
+            self.cached = reduce_partials(partial for _, partial in self.partials.values())
+            self.version += 1
+            return self.version
+
+    def stats(self):
+        self.refresh()
+        stats = self.cached
+        return dict(stats, parties=dict(stats["parties"]), methods=dict(stats["methods"]))
+
+    def has_voted(self, voter):
+        """True if the voter has a vote at any booth"""
+        self.refresh()
+        with self.lock:
+            return any(voter in partial["voters"] for _, partial in self.partials.values())
+
+
+if __name__ == "__main__":
+    # python vote_shards.py [booth-pattern] -> district / booth totals
+    pattern = sys.argv[1] if len(sys.argv) > 1 else "*"
+    started = datetime.now()
+    stats = tally_shards(booths=pattern)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(json.dumps(stats, indent=2))
+    print(f"[INFO] Tallied {stats['shards']} shards in {elapsed:.2f}s; "
+          f"{len(stats['duplicates'])} voters found at more than one booth")
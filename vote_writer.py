@@ -0,0 +1,375 @@
+"""Single vote writer shared by every kiosk and the web app on a host.
+
+Clients submit votes as line-delimited JSON over a local TCP socket,
+authenticated with an HMAC challenge on a shared key. The writer owns the
+has-voted check, so check-and-set on the voter id is atomic across
+processes, and it commits submissions in groups: every vote that queues up
+while the previous batch is being fsynced (up to MAX_BATCH) is written with
+one write and one fsync, so commit latency stays around one fsync while
+throughput grows with the number of kiosks.
+
+The shared key comes from VOTE_WRITER_AUTHKEY or from the file named by
+VOTE_WRITER_KEY_FILE (which must not be readable by other users). There is
+no default key.
+
+    python vote_writer.py            # run the writer
+"""
+import hashlib
+import hmac
+import json
+import os
+import queue
+import secrets
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+from ballot import UNKNOWN_CODE, get_ballot
+from election_db import open_db, sqlite_enabled, vote_row
+from tally_engine import TallyEngine
+from vote_log import GUI_VOTES_FILE, open_log
+from vote_shards import BoothShards, shards_enabled
+
+WRITER_HOST = os.environ.get("VOTE_WRITER_HOST", "127.0.0.1")
+WRITER_PORT = int(os.environ.get("VOTE_WRITER_PORT", "5056"))
+KEY_FILE = os.environ.get("VOTE_WRITER_KEY_FILE")
+# Writing votes directly when no writer is running is only safe with a
+# single voting process; it must be opted into explicitly
+DIRECT_FALLBACK = os.environ.get("VOTE_WRITER_FALLBACK") == "direct"
+
+MAX_BATCH = 256
+# Extra time the committer may wait for more votes after the first one. At 0
+# a batch is whatever queued up while the previous commit was fsyncing, so
+# batches grow with load while an idle writer commits immediately
+GROUP_COMMIT_WINDOW = float(os.environ.get("VOTE_WRITER_WINDOW", "0"))
+MAX_REQUEST_BYTES = 64 * 1024
+CLIENT_TIMEOUT = 10
+
+
+class VoteWriterUnavailable(Exception):
+    """No writer reachable; the vote was not sent"""
+
+
+class VoteOutcomeUnknown(Exception):
+    """The connection dropped after sending; the vote may have been committed"""
+
+
+def load_authkey():
+    """Shared key from the environment or a private key file; None if unset"""
+    key = os.environ.get("VOTE_WRITER_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    if not KEY_FILE:
+        return None
+    mode = os.stat(KEY_FILE).st_mode
+    if mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"{KEY_FILE} must not be accessible by group or others (chmod 600)")
+    with open(KEY_FILE, "rb") as f:
+        key = f.read().strip()
+    return key or None
+
+
+def sign(key, challenge):
+    return hmac.new(key, challenge.encode("ascii"), hashlib.sha256).hexdigest()
+
+
+def validate_request(request):
+    """Return an error message for a malformed vote request, or None"""
+    if not isinstance(request, dict):
+        return "request must be a JSON object"
+    for field in ("voter", "party", "method"):
+        if not isinstance(request.get(field), str) or not request[field].strip():
+            return f"'{field}' must be a non-empty string"
+    if not isinstance(request.get("record"), dict):
+        return "'record' must be a JSON object"
+    if get_ballot().code_of(request["party"]) == UNKNOWN_CODE:
+        return f"'{request['party']}' is not on the ballot"
+    return None
+
+
+class Submission:
+    def __init__(self, voter, party, method, record):
+        self.voter = voter
+        self.party = party
+        self.method = method
+        self.record = record
+        self.status = None
+        self.done = threading.Event()
+
+
+class VoteWriter:
+    """Group-commit writer in front of the vote log (or the SQLite store)"""
+
+    def __init__(self, votes_file=GUI_VOTES_FILE, use_db=None, max_batch=MAX_BATCH,
+                 window=GROUP_COMMIT_WINDOW, use_shards=None):
+        self.use_db = sqlite_enabled() if use_db is None else use_db
+        self.db = open_db() if self.use_db else None
+        # ELECTION_STORE=shards: this booth's per-window shard files
+        self.shards = BoothShards() if not self.use_db and (
+            shards_enabled() if use_shards is None else use_shards) else None
+        self.log = None if self.use_db or self.shards else open_log(votes_file)
+        # Already-voted sets for every JSON source, kept current incrementally
+        self.tally = None if self.use_db or self.shards else TallyEngine()
+        self.max_batch = max_batch
+        self.window = window
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.committed = 0
+
+    def submit(self, voter, party, method, record):
+        """Queue one vote and wait for its group commit; returns the status"""
+        submission = Submission(voter, party, method, record)
+        self.queue.put(submission)
+        submission.done.wait()
+        return submission.status
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self.queue.get(timeout=remaining))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def commit(self, batch):
+        if self.use_db:
+            rows = [vote_row(s.voter, s.party, s.method, s.record) for s in batch]
+            for submission, recorded in zip(batch, self.db.record_votes_checked(rows)):
+                submission.status = "recorded" if recorded else "duplicate"
+            return
+
+        # Check-and-set against every recorded vote plus earlier votes in this batch
+        recorded = self.shards or self.tally
+        if self.tally is not None:
+            self.tally.refresh()
+        accepted, seen = [], set()
+        for submission in batch:
+            if submission.voter in seen or recorded.has_voted(submission.voter):
+                submission.status = "duplicate"
+            else:
+                seen.add(submission.voter)
+                accepted.append(submission)
+        if self.shards is not None:
+            # Shards are tallied on their own, so each record carries its candidate code and method
+            ballot = get_ballot()
+            self.shards.append_many([(s.voter, dict(s.record, code=ballot.code_of(s.party), method=s.method))
+                                     for s in accepted])
+        else:
+            self.log.append_many([(s.voter, s.record) for s in accepted])
+        for submission in accepted:
+            submission.status = "recorded"
+
+    def run(self):
+        """Committer loop: one write + fsync per batch"""
+        while True:
+            batch = self.next_batch()
+            try:
+                self.commit(batch)
+                self.batches += 1
+                self.committed += sum(1 for s in batch if s.status == "recorded")
+            except Exception as e:
+                print(f"[ERROR] Group commit of {len(batch)} votes failed: {e}")
+                for submission in batch:
+                    submission.status = "error"
+            for submission in batch:
+                submission.done.set()
+
+    def respond(self, line):
+        """Reply dict for one request line"""
+        try:
+            request = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return {"status": "error", "error": "malformed JSON"}
+        if isinstance(request, dict) and request.get("op") == "stats":
+            return {"status": "ok", "batches": self.batches, "committed": self.committed}
+        error = validate_request(request)
+        if error:
+            return {"status": "error", "error": error}
+        return {"status": self.submit(request["voter"].strip(), request["party"], request["method"],
+                                      request["record"])}
+
+    def serve(self, host=WRITER_HOST, port=WRITER_PORT, authkey=None):
+        authkey = authkey or load_authkey()
+        if not authkey:
+            raise SystemExit("[ERROR] Set VOTE_WRITER_AUTHKEY or VOTE_WRITER_KEY_FILE before starting the vote writer")
+        writer = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def send(self, body):
+                self.wfile.write((json.dumps(body) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            def handle(self):
+                # Challenge-response so only holders of the shared key can vote
+                challenge = secrets.token_hex(16)
+                self.send({"challenge": challenge})
+                try:
+                    reply = json.loads(self.rfile.readline(MAX_REQUEST_BYTES))
+                    authenticated = isinstance(reply, dict) and hmac.compare_digest(
+                        str(reply.get("auth", "")), sign(authkey, challenge))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    authenticated = False
+                if not authenticated:
+                    self.send({"status": "error", "error": "authentication failed"})
+                    return
+                self.send({"status": "ok"})
+
+                while True:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                    if not line:
+                        break
+                    try:
+                        self.send(writer.respond(line))
+                    except Exception as e:
+                        print(f"[ERROR] Vote writer request failed: {e}")
+                        self.send({"status": "error", "error": "internal error"})
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        socketserver.ThreadingTCPServer.daemon_threads = True
+        threading.Thread(target=self.run, daemon=True).start()
+        if self.use_db:
+            backend = self.db.path
+        elif self.shards is not None:
+            backend = f"booth {self.shards.booth} shards in {self.shards.root}"
+        else:
+            backend = self.log.log_path
+        with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+            print(f"[INFO] Vote writer listening on {host}:{port}, committing to {backend}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("\n[INFO] Vote writer stopped")
+
+
+class WriterConnection:
+    """Authenticated client connection to the vote writer"""
+
+    def __init__(self, address, authkey):
+        self.sock = socket.create_connection(address, timeout=CLIENT_TIMEOUT)
+        self.file = self.sock.makefile("rwb")
+        challenge = self.recv()["challenge"]
+        self.send({"auth": sign(authkey, challenge)})
+        if self.recv().get("status") != "ok":
+            self.close()
+            raise VoteWriterUnavailable("Vote writer rejected the shared key")
+
+    def send(self, body):
+        self.file.write((json.dumps(body) + "\n").encode("utf-8"))
+        self.file.flush()
+
+    def stale(self):
+        """True if the writer has closed this idle connection (e.g. it was restarted)"""
+        try:
+            self.sock.setblocking(False)
+            try:
+                data = self.sock.recv(1, socket.MSG_PEEK)
+            finally:
+                self.sock.settimeout(CLIENT_TIMEOUT)
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
+        return not data
+
+    def recv(self):
+        line = self.file.readline(MAX_REQUEST_BYTES)
+        if not line:
+            raise EOFError("vote writer closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        try:
+            self.file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+_client = None
+_client_lock = threading.Lock()
+_local_writer = None
+_local_lock = threading.Lock()
+
+
+def submit_vote(voter, party, method, record, address=None):
+    """Send a vote to the writer; returns "recorded", "duplicate" or "error".
+
+    Raises VoteWriterUnavailable if no writer is listening (or no key is
+    configured) and VoteOutcomeUnknown if the connection dropped while
+    waiting for the commit.
+    """
+    global _client
+    request = {"voter": voter, "party": party, "method": method, "record": record}
+    with _client_lock:
+        for attempt in range(2):
+            reused = _client is not None
+            try:
+                if _client is not None and _client.stale():
+                    _client.close()
+                    _client = None
+                    reused = False
+                if _client is None:
+                    authkey = load_authkey()
+                    if not authkey:
+                        raise VoteWriterUnavailable("VOTE_WRITER_AUTHKEY / VOTE_WRITER_KEY_FILE is not set")
+                    _client = WriterConnection(address or (WRITER_HOST, WRITER_PORT), authkey)
+                _client.send(request)
+            except (OSError, EOFError, ValueError, KeyError) as e:
+                # Stale connection from before a writer restart: reconnect once
+                if _client is not None:
+                    _client.close()
+                _client = None
+                if attempt == 1:
+                    raise VoteWriterUnavailable(f"Vote writer not reachable: {e}")
+                continue
+            try:
+                return _client.recv()["status"]
+            except EOFError as e:
+                _client.close()
+                _client = None
+                # Closed without a byte of reply on a connection kept from an
+                # earlier call: the writer went away between votes. Resending
+                # once is safe, since the writer's has-voted check turns an
+                # already committed vote into "duplicate", never a second vote
+                if reused and attempt == 0:
+                    continue
+                raise VoteOutcomeUnknown(f"Vote writer connection lost: {e}")
+            except (OSError, ValueError, KeyError) as e:
+                # The vote may or may not have been committed; never resend it
+                _client.close()
+                _client = None
+                raise VoteOutcomeUnknown(f"Vote writer connection lost: {e}")
+
+
+def record_vote(voter, party, method, record):
+    """Record a vote through the writer; returns "recorded", "duplicate" or "error".
+
+    When the writer is down this fails closed (VoteWriterUnavailable) unless
+    VOTE_WRITER_FALLBACK=direct opts a single-kiosk setup into committing
+    in-process instead.
+    """
+    global _local_writer
+    try:
+        return submit_vote(voter, party, method, record)
+    except VoteWriterUnavailable:
+        if not DIRECT_FALLBACK:
+            raise
+    print("[WARNING] Vote writer not running; committing directly (VOTE_WRITER_FALLBACK=direct)")
+    with _local_lock:
+        if _local_writer is None:
+            _local_writer = VoteWriter()
+        submission = Submission(voter, party, method, record)
+        _local_writer.commit([submission])
+        return submission.status
+
+
+if __name__ == "__main__":
+    VoteWriter().serve()
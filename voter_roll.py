@@ -0,0 +1,138 @@
+"""Electoral roll: streaming CSV import into the voters table.
+
+The roll is a CSV with a header row and the columns
+``voter_id,name,aadhar,dob,password`` (dob as YYYY-MM-DD, password the
+initial credential issued to the voter). It is read in chunks, so a roll of
+millions of voters never sits in memory at once; credentials are hashed
+across a process pool and age eligibility is computed per chunk with
+vectorized date arithmetic.
+
+    python voter_roll.py [roll.csv]
+"""
+import hashlib
+import hmac
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import date
+
+import pandas as pd
+
+from election_db import normalize_aadhar, open_db
+
+ROLL_FILE = os.environ.get("VOTER_ROLL_FILE", "voter_roll.csv")
+ROLL_COLUMNS = ["voter_id", "name", "aadhar", "dob", "password"]
+ROLL_CHUNK_ROWS = int(os.environ.get("VOTER_ROLL_CHUNK_ROWS", "50000"))
+# PBKDF2 rounds per credential; the pool is what makes this affordable for
+# millions of voters
+HASH_ITERATIONS = int(os.environ.get("VOTER_HASH_ITERATIONS", "10000"))
+HASH_WORKERS = int(os.environ["VOTER_HASH_WORKERS"]) if os.environ.get("VOTER_HASH_WORKERS") else None
+VOTING_AGE = 18
+
+
+def hash_credential(password, iterations=HASH_ITERATIONS):
+    """Salted PBKDF2-SHA256 hash stored as pbkdf2_sha256$<iterations>$<salt>$<hash>"""
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def hash_credentials(passwords, iterations=HASH_ITERATIONS):
+    """Worker task: hash one batch of passwords"""
+    return [hash_credential(password, iterations) for password in passwords]
+
+
+def verify_credential(password, stored):
+    """Check a password against a stored hash (PBKDF2, or a legacy unsalted SHA-256 hex)"""
+    if not password or not stored:
+        return False
+    if stored.startswith("pbkdf2_sha256$"):
+        _, iterations, salt, digest = stored.split("$")
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt),
+                                        int(iterations)).hex()
+        return hmac.compare_digest(candidate, digest)
+    return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+
+
+def eligible_from(dob):
+    """First date (YYYY-MM-DD) each voter is VOTING_AGE, for a Series of dob strings.
+
+    Someone is old enough once today >= (birth year + VOTING_AGE, month, day),
+    which is exactly an ISO string comparison, so logins never parse dates.
+    Unparseable dates give None, i.e. not eligible.
+    """
+    parsed = pd.to_datetime(dob, format="%Y-%m-%d", errors="coerce")
+    eligible = (parsed.dt.year + VOTING_AGE).astype("Int64").astype(str).str.zfill(4) + parsed.dt.strftime("-%m-%d")
+    return eligible.where(parsed.notna(), None)
+
+
+def is_eligible(voter, today=None):
+    """True once the voter's precomputed eligibility date has passed"""
+    return bool(voter.get("eligible_from")) and voter["eligible_from"] <= (today or date.today().isoformat())
+
+
+def read_roll(path=ROLL_FILE, chunksize=ROLL_CHUNK_ROWS):
+    """Stream the roll as DataFrame chunks of string columns"""
+    return pd.read_csv(path, usecols=ROLL_COLUMNS, dtype=str, keep_default_na=False,
+                       chunksize=chunksize)
+
+
+def chunk_rows(chunk, hashes):
+    """voters table rows for one chunk and its password hashes"""
+    aadhar = [normalize_aadhar(value) for value in chunk["aadhar"]]
+    return list(zip(chunk["voter_id"].str.strip(), chunk["name"].str.strip(), aadhar,
+                    chunk["dob"], hashes, eligible_from(chunk["dob"])))
+
+
+def write_chunk(db, chunk, hashed_batches):
+    hashes = [digest for batch in hashed_batches for digest in batch]
+    return db.upsert_voters(chunk_rows(chunk, hashes))
+
+
+def import_roll(path=ROLL_FILE, db=None, workers=HASH_WORKERS, chunksize=ROLL_CHUNK_ROWS):
+    """Import (or re-import) a roll CSV into the voters table; returns rows imported.
+
+    workers=1 hashes in this process, without a pool.
+    """
+    db = db or open_db()
+    started = time.monotonic()
+    read = imported = 0
+    batches = (workers or os.cpu_count() or 1) * 4
+    with ProcessPoolExecutor(max_workers=workers) if workers != 1 else nullcontext() as pool:
+        pending = None
+        for chunk in read_roll(path, chunksize):
+            chunk = chunk[chunk["voter_id"].str.strip() != ""]
+            passwords = chunk["password"].tolist()
+            size = max(1, -(-len(passwords) // batches))
+            # Hash this chunk in the pool while the previous one is written
+            password_batches = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+            hashed = (pool.map(hash_credentials, password_batches) if pool is not None
+                      else [hash_credentials(batch) for batch in password_batches])
+            if pending is not None:
+                imported += write_chunk(db, *pending)
+            pending = (chunk, hashed)
+            read += len(chunk)
+            print(f"[INFO] Read {read} voters from {path}")
+        if pending is not None:
+            imported += write_chunk(db, *pending)
+    print(f"[INFO] Imported {imported} voters into {db.path} in {time.monotonic() - started:.1f}s")
+    return imported
+
+
+def open_roll(path=ROLL_FILE, workers=1):
+    """The voters table, importing the roll file if the table is empty.
+
+    Serial by default, so it is safe to call from an app's startup (a process
+    pool started while a module is still importing breaks under spawn); bulk
+    imports belong in `python voter_roll.py`.
+    """
+    db = open_db()
+    if not db.voter_count() and os.path.exists(path):
+        import_roll(path, db, workers=workers)
+    return db
+
+
+if __name__ == "__main__":
+    import_roll(sys.argv[1] if len(sys.argv) > 1 else ROLL_FILE)